@@ -1,13 +1,353 @@
+import os
+import json
+import time
+import queue
+import atexit
+import re
+import glob
+import hashlib
 import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so slots fall back to process IDs
+    fcntl = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("AuditAgent")
 
+# Append-only JSONL trail, one file and hash chain per writer. "{worker}" is replaced by the lowest slot number
+# no running process holds (0, 1, ...), so a restarted worker continues its slot's file and the number of files
+# stays at the number of concurrent workers. Without "{worker}" the path must not be shared by several processes.
+# Empty = console only.
+AUDIT_LOG_PATH = os.getenv("AUDIT_LOG_PATH", "audit-{worker}.jsonl")
+AUDIT_MAX_WORKERS = int(os.getenv("AUDIT_MAX_WORKERS", "64"))
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FSYNC_SECONDS = float(os.getenv("AUDIT_FSYNC_SECONDS", "1.0"))  # Max time written events may sit in the OS cache
+AUDIT_BLOCK_SECONDS = float(os.getenv("AUDIT_BLOCK_SECONDS", "0"))  # > 0: wait this long for queue room before dropping
+AUDIT_HASH_CHAIN = os.getenv("AUDIT_HASH_CHAIN", "true").lower() == "true"
+AUDIT_CONSOLE = os.getenv("AUDIT_CONSOLE", "true").lower() == "true"
+
+GENESIS_HASH = "0" * 64
+TAIL_BLOCK_SIZE = 65536
+_STOP = object()
+
+@dataclass(slots=True)
+class AuditEvent:
+    action: str
+    details: str
+    timestamp: float
+    data: dict = field(default_factory=dict)
+
+    @property
+    def level(self) -> str:
+        return "error" if self.action.endswith("ERROR") else "info"
+
+    def to_json(self, pid: int) -> str:
+        record = {
+            "ts": datetime.fromtimestamp(self.timestamp, timezone.utc).isoformat(),
+            "action": self.action,
+            "level": self.level,
+            "details": self.details,
+            "pid": pid,
+        }
+        if self.data:
+            record["data"] = self.data
+        return json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def chain_hash(prev_hash: str, batch: bytes) -> str:
+    return hashlib.sha256(prev_hash.encode() + batch).hexdigest()
+
+def parse_chain(line: bytes) -> dict | None:
+    """The chain entry of a complete chain record line; None for events and torn (unterminated or unparsable) lines."""
+    if not line.startswith(b'{"chain"') or not line.endswith(b"\n"):
+        return None
+    try:
+        return json.loads(line)["chain"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def chain_tail(path: str) -> tuple[str, int]:
+    """
+    (hash of the last chain record in the file, offset just after it), found by scanning back from the end
+    block by block; (GENESIS_HASH, 0) if there is none. Anything past the offset was never chained.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return GENESIS_HASH, 0
+    with f:
+        pos = f.seek(0, os.SEEK_END)
+        carry = b""  # Start of a line that continues into the block read before
+        while pos > 0:
+            step = min(TAIL_BLOCK_SIZE, pos)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step) + carry
+            # Unless this is the start of the file, the first line may begin in an earlier block
+            first_end = block.find(b"\n") + 1 if pos > 0 else 0
+            if pos > 0 and first_end == 0:
+                carry = block
+                continue
+            carry = block[:first_end]
+            line_end = len(block)
+            while line_end > first_end:
+                newline = block.rfind(b"\n", first_end, line_end - 1)
+                line_start = newline + 1 if newline != -1 else first_end
+                chain = parse_chain(block[line_start:line_end])
+                if chain is not None:
+                    return chain["hash"], pos + line_end
+                line_end = line_start
+    return GENESIS_HASH, 0
+
+def claim_slot(template: str) -> tuple[str, object | None]:
+    """
+    Resolves "{worker}" in template to the lowest free slot, locked (flock) for as long as the returned
+    lock file stays open; the OS releases it if the process dies. Returns (path, lock file).
+    """
+    if "{worker}" not in template:
+        return template, None
+    if fcntl is None:
+        return template.replace("{worker}", str(os.getpid())), None
+    for slot in range(AUDIT_MAX_WORKERS):
+        path = template.replace("{worker}", str(slot))
+        lock = open(path + ".lock", "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return path, lock
+        except OSError:
+            lock.close()
+    raise OSError(f"All {AUDIT_MAX_WORKERS} audit log slots are in use")
+
+def slot_paths(template: str) -> dict[int, str]:
+    """Existing audit files of a "{worker}" template, by slot."""
+    prefix, suffix = template.split("{worker}", 1)
+    pattern = re.compile(re.escape(os.path.basename(prefix)) + r"(\d+)" + re.escape(suffix) + "$")
+    paths = {}
+    for path in glob.glob(glob.escape(prefix) + "*" + glob.escape(suffix)):
+        match = pattern.match(os.path.basename(path))
+        if match:
+            paths[int(match.group(1))] = path
+    return paths
+
+def verify_chain(path: str = AUDIT_LOG_PATH) -> tuple[bool, int, str | None]:
+    """
+    Checks the hash chain of an audit file, or of every slot's file when path contains "{worker}"
+    (a missing slot below the highest one means a whole file was deleted).
+    Returns (ok, verified batches, problem); events after the last chain record (a crash mid-batch) are reported.
+    Lines a crashed writer left unchained are sealed by the next writer with a chain record marked "recovered".
+    """
+    if "{worker}" in path:
+        paths = slot_paths(path)
+        batches = 0
+        for slot in range(max(paths, default=-1) + 1):
+            if slot not in paths:
+                return False, batches, f"{path.replace('{worker}', str(slot))} is missing"
+            ok, file_batches, problem = verify_chain(paths[slot])
+            batches += file_batches
+            if not ok:
+                return False, batches, f"{paths[slot]}: {problem}"
+        return True, batches, None
+
+    prev_hash = GENESIS_HASH
+    pending = []
+    batches = 0
+    with open(path, "rb") as f:
+        for number, line in enumerate(f, 1):
+            chain = parse_chain(line)
+            if chain is None:
+                pending.append(line)
+                continue
+            if chain["prev"] != prev_hash:
+                return False, batches, f"line {number}: batch doesn't follow the previous one"
+            if chain["events"] != len(pending) or chain["hash"] != chain_hash(prev_hash, b"".join(pending)):
+                return False, batches, f"line {number}: batch contents don't match its hash"
+            prev_hash = chain["hash"]
+            pending = []
+            batches += 1
+    if pending:
+        return False, batches, f"{len(pending)} events after the last chain record"
+    return True, batches, None
+
 class AuditAgent:
-    def log_action(self, action: str, details: str):
+    """
+    Structured audit trail. log_action() only enqueues; a background thread drains the queue in batches,
+    appends them to AUDIT_LOG_PATH as JSON lines and fsyncs at most every AUDIT_FSYNC_SECONDS.
+    When the queue is full, events are dropped (and counted) rather than slowing requests down.
+    With AUDIT_HASH_CHAIN, every batch is followed by a record hashing it together with the previous
+    batch's hash, so edits or deletions in the file are detectable (see verify_chain).
+    """
+    def __init__(self):
+        self.template = AUDIT_LOG_PATH.replace("{pid}", str(os.getpid())) if AUDIT_LOG_PATH else None
+        self.path = None  # Resolved by the writer thread
+        self._slot_lock = None
+        self._queue = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._file = None
+        self._prev_hash = GENESIS_HASH
+        self._unsynced = False
+        self._last_fsync = time.monotonic()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.fsyncs = 0
+        self.write_errors = 0
+
+    def log_action(self, action: str, details: str = "", **data):
         """
-        Logs an action to the console.
+        Records an audit event (extra keyword arguments are kept as structured data).
         """
-        logger.info(f"ACTION: {action} | DETAILS: {details}")
+        if self._thread is None:
+            self.start()
+        event = AuditEvent(action, details, time.time(), data)
+        try:
+            if AUDIT_BLOCK_SECONDS > 0:
+                self._queue.put(event, timeout=AUDIT_BLOCK_SECONDS)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def shutdown(self, timeout: float = 5.0):
+        """Writes out whatever is queued and fsyncs; log_action() restarts the writer if called afterwards."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _run(self):
+        if self.template:
+            try:
+                self.path, self._slot_lock = claim_slot(self.template)
+                self._file = open(self.path, "ab")
+                if AUDIT_HASH_CHAIN:
+                    self._resume_chain()
+            except OSError as e:
+                print(f"Audit log unavailable ({e}), logging to console only")
+                self._file = None
+
+        stop = False
+        while not stop:
+            batch = []
+            try:
+                item = self._queue.get(timeout=AUDIT_FSYNC_SECONDS)
+                # Whatever else piled up while the previous batch was written goes into this one
+                while item is not _STOP:
+                    batch.append(item)
+                    if len(batch) >= AUDIT_BATCH_SIZE:
+                        break
+                    item = self._queue.get_nowait()
+                stop = item is _STOP
+            except queue.Empty:
+                pass
+
+            if batch:
+                self._write(batch)
+            if self._unsynced and (stop or time.monotonic() - self._last_fsync >= AUDIT_FSYNC_SECONDS):
+                self._fsync()
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._slot_lock is not None:
+            self._slot_lock.close()
+            self._slot_lock = None
+
+    def _resume_chain(self):
+        """
+        Continues the chain already in the file. Lines after its last chain record (a partial batch, or a torn line,
+        left by a crash) are sealed with a "recovered" chain record so the file verifies and new batches follow them.
+        """
+        self._prev_hash, tail_start = chain_tail(self.path)
+        size = os.path.getsize(self.path)
+        if size <= tail_start:
+            return
+
+        digest = hashlib.sha256(self._prev_hash.encode())
+        lines = 0
+        last = b"\n"
+        with open(self.path, "rb") as f:
+            f.seek(tail_start)
+            while chunk := f.read(TAIL_BLOCK_SIZE):
+                digest.update(chunk)
+                lines += chunk.count(b"\n")
+                last = chunk[-1:]
+        payload = b""
+        if last != b"\n":
+            # Terminate the torn line so the records after it start on a line of their own
+            payload = b"\n"
+            digest.update(payload)
+            lines += 1
+        batch_hash = digest.hexdigest()
+        chain = {"chain": {"prev": self._prev_hash, "hash": batch_hash, "events": lines, "recovered": True}}
+        self._file.write(payload + json.dumps(chain, separators=(",", ":")).encode() + b"\n")
+        self._file.flush()
+        self._prev_hash = batch_hash
+        self._unsynced = True
+        print(f"Audit log {self.path}: sealed {lines} unchained lines left by an earlier writer")
+
+    def _write(self, batch: list[AuditEvent]):
+        if AUDIT_CONSOLE:
+            for event in batch:
+                logger.info(f"ACTION: {event.action} | DETAILS: {event.details}")
+        if self._file is None:
+            self.written += len(batch)
+            return
+
+        pid = os.getpid()
+        payload = "".join(event.to_json(pid) + "\n" for event in batch).encode()
+        if AUDIT_HASH_CHAIN:
+            batch_hash = chain_hash(self._prev_hash, payload)
+            chain = {"chain": {"prev": self._prev_hash, "hash": batch_hash, "events": len(batch)}}
+            payload += json.dumps(chain, separators=(",", ":")).encode() + b"\n"
+        try:
+            self._file.write(payload)
+            self._file.flush()
+        except OSError as e:
+            self.write_errors += 1
+            print(f"Audit write failed: {e}")
+            return
+        if AUDIT_HASH_CHAIN:
+            self._prev_hash = batch_hash
+        self._unsynced = True
+        self.written += len(batch)
+        self.batches += 1
+
+    def _fsync(self):
+        try:
+            os.fsync(self._file.fileno())
+            self.fsyncs += 1
+        except OSError as e:
+            self.write_errors += 1
+            print(f"Audit fsync failed: {e}")
+        self._unsynced = False
+        self._last_fsync = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "fsyncs": self.fsyncs,
+            "write_errors": self.write_errors,
+        }
 
 audit_agent = AuditAgent()
@@ -1,60 +1,44 @@
 import os
 import json
-import google.generativeai as genai
+import random
+import asyncio
+import functools
+import threading
 from dotenv import load_dotenv
-import base64
 
 load_dotenv()
 
-class GeminiAgent:
-    def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        self.available = False
-        if self.api_key and self.api_key != "YOUR_API_KEY_HERE":
-            try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel('gemini-2.5-flash')
-                self.available = True
-            except Exception as e:
-                print(f"Gemini Init Error: {e}")
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60"))  # Per-attempt deadline
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "2"))
+GEMINI_BACKOFF_SECONDS = float(os.getenv("GEMINI_BACKOFF_SECONDS", "0.5"))  # Base for exponential backoff
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))  # In-flight async requests per process
 
-    def analyze(self, text: str) -> dict:
-        """Text-only analysis (legacy/fast)"""
-        if not self.available:
-            return None
+# "chunked": extracted text instead of the PDF when there is enough of it, long documents split into page ranges
+# analysed in parallel, and only likely signature pages sent for visual detection. "document": the whole PDF in one call
+GEMINI_ANALYSIS_MODE = os.getenv("GEMINI_ANALYSIS_MODE", "chunked").lower()
+GEMINI_MIN_CHARS_PER_PAGE = int(os.getenv("GEMINI_MIN_CHARS_PER_PAGE", "200"))  # Less text on average => treated as scanned
+GEMINI_CHUNK_PAGES = int(os.getenv("GEMINI_CHUNK_PAGES", "25"))
+GEMINI_CHUNK_CHARS = int(os.getenv("GEMINI_CHUNK_CHARS", "60000"))
+GEMINI_SIGNATURE_MAX_PAGES = int(os.getenv("GEMINI_SIGNATURE_MAX_PAGES", "4"))
 
-        prompt = """
-        You are a Legal Expert AI. Analyze the following contract text.
-        
-        Output a JSON object with this structure:
-        {
-            "summary_points": ["List of 3-5 key terms like duration, payment, jurisdiction"],
-            "red_flags": ["List of potential risks like indefinite liability, non-compete, arbitration"],
-            "risk_score": 0 (Integer 0-100, where 100 is high risk)
-        }
-        
-        Do not use markdown formatting like ```json. Just return the raw JSON string.
-        
-        Contract Text:
-        """ + text[:10000]
+# Words around signature blocks, used to pick the pages worth sending for signature detection
+SIGNATURE_PAGE_HINTS = ("signature", "signed", "sign here", "by:", "witness", "signatory", "name:", "title:", "date:")
 
-        try:
-            response = self.model.generate_content(prompt)
-            clean_text = response.text.replace("```json", "").replace("```", "").strip()
-            return json.loads(clean_text)
-        except Exception as e:
-            print(f"Gemini Analysis Error: {e}")
-            return None
-
-    def analyze_document(self, file_content: bytes, mime_type: str = "application/pdf") -> dict:
-        """
-        Analyzes a document (PDF/Image) for both Legal Risks AND Signature Locations.
-        Returns a dict with 'legal_analysis' and 'suggested_places'.
-        """
-        if not self.available:
-            return None
+@functools.cache
+def retryable_errors() -> tuple:
+    """Transient failures worth retrying (rate limit, overload, timeouts)."""
+    from google.api_core import exceptions as google_exceptions
+    return (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+        asyncio.TimeoutError,
+        TimeoutError,
+        ConnectionError,
+    )
 
-        prompt = """
+DOCUMENT_ANALYSIS_PROMPT = """
         You are a Smart Document Intelligence Agent. Analyze this document in detail.
 
         1. **Classification**: Identify the document type (e.g., NDA, Employment Contract, Invoice, Lease, Unknown).
@@ -102,19 +86,287 @@ class GeminiAgent:
         }
 
         Do not use markdown. Return raw JSON.
+"""
+
+TEXT_ANALYSIS_PROMPT = """
+        You are a Smart Document Intelligence Agent. Below is text extracted from {part}.
+        Page boundaries are marked with "--- Page N ---".
+
+        1. **Classification**: Identify the document type (e.g., NDA, Employment Contract, Invoice, Lease, Unknown).
+        2. **Executive Summary**: A concise paragraph explaining WHO is involved, WHAT the document is about, and its PURPOSE.
+        3. **Entity Extraction**: parties, effective date, monetary value / payment terms, governing law jurisdiction.
+        4. **Validity Check**: Does the document appear complete? Is it a draft?
+        5. **Legal Risks**: Identify red flags and risk score (0-100) for the text given.
+
+        Output a JSON object with this EXACT structure:
+        {{
+            "document_type": "String",
+            "executive_summary": "String",
+            "entities": {{
+                "parties": ["Name 1", "Name 2"],
+                "effective_date": "String or null",
+                "monetary_value": "String or null",
+                "jurisdiction": "String or null"
+            }},
+            "validity_check": {{
+                "is_valid_format": true/false,
+                "status": "Draft/Final/Signed/Unknown",
+                "notes": "Brief comment"
+            }},
+            "legal_analysis": {{
+                "summary_points": ["List of key terms"],
+                "red_flags": ["List of risks"],
+                "risk_score": 0
+            }}
+        }}
+
+        Do not use markdown. Return raw JSON.
+"""
+
+SIGNATURE_PLACES_PROMPT = """
+        Find visual locations in this document where a signature is EXPLICITLY required.
+        Look for labels like "Sign Here", "Signature", "By:", "Authorized Signatory".
+        Do NOT include general text containing "sign" (e.g., "design", "assignment") or just "Date" unless it is a field.
+        Return bounding boxes in normalized coordinates (0-1000) for the signature line/box.
+
+        Output a JSON object with this EXACT structure:
+        {
+            "suggested_places": [
+                {
+                    "page": 1,
+                    "box_2d": [ymin, xmin, ymax, xmax],
+                    "label": "Sign Here"
+                }
+            ]
+        }
+
+        Do not use markdown. Return raw JSON.
+"""
+
+def page_ranges(page_lengths: list[int], max_pages: int = GEMINI_CHUNK_PAGES, max_chars: int = GEMINI_CHUNK_CHARS) -> list[tuple[int, int]]:
+    """Splits pages into consecutive (start, end) ranges of at most max_pages pages and (unless a single page is bigger) max_chars characters."""
+    ranges = []
+    start = chars = 0
+    for i, length in enumerate(page_lengths):
+        if i > start and (i - start >= max_pages or chars + length > max_chars):
+            ranges.append((start, i))
+            start, chars = i, 0
+        chars += length
+    if page_lengths:
+        ranges.append((start, len(page_lengths)))
+    return ranges
+
+def likely_signature_pages(page_texts: list[str], max_pages: int = GEMINI_SIGNATURE_MAX_PAGES) -> list[int]:
+    """
+    Indices of the pages most likely to hold signature blocks, in page order.
+    Pages are ranked by signature wording; without any, signature blocks are assumed to be at the end.
+    """
+    scores = [sum(page.lower().count(hint) for hint in SIGNATURE_PAGE_HINTS) for page in page_texts]
+    ranked = sorted((i for i, score in enumerate(scores) if score), key=lambda i: (-scores[i], -i))
+    if not ranked:
+        ranked = list(range(len(page_texts) - 1, -1, -1))
+    return sorted(ranked[:max_pages])
+
+def remap_places(places: list[dict], pages: list[int]) -> list[dict]:
+    """Maps page numbers from a sub-PDF made of the given page indices back to the original document."""
+    remapped = []
+    for place in places:
+        page = place.get("page", 1)
+        if isinstance(page, int) and 1 <= page <= len(pages):
+            remapped.append({**place, "page": pages[page - 1] + 1})
+    return remapped
+
+def merge_analyses(parts: list[dict]) -> dict:
+    """
+    Combines per-chunk results (in page order) into one analysis: classification, summary and validity come from the
+    first chunk that has them, entities and findings are unioned, and the risk score is the highest of any chunk.
+    """
+    if len(parts) == 1:
+        return parts[0]
+
+    def first(key: str, default=None, source=None):
+        for part in parts:
+            value = (part.get(source) or {}).get(key) if source else part.get(key)
+            if value and value != "Unknown":
+                return value
+        return default
+
+    def union(values) -> list:
+        seen = {}
+        for value in values:
+            if isinstance(value, str) and value.strip():
+                seen.setdefault(value.strip().lower(), value.strip())
+        return list(seen.values())
+
+    def all_of(key: str, source: str) -> list:
+        return [value for part in parts for value in ((part.get(source) or {}).get(key) or [])]
+
+    scores = [(part.get("legal_analysis") or {}).get("risk_score") for part in parts]
+    return {
+        "document_type": first("document_type", "Unknown"),
+        "executive_summary": first("executive_summary", "No summary provided."),
+        "entities": {
+            "parties": union(all_of("parties", "entities")),
+            "effective_date": first("effective_date", source="entities"),
+            "monetary_value": first("monetary_value", source="entities"),
+            "jurisdiction": first("jurisdiction", source="entities")
+        },
+        "validity_check": parts[0].get("validity_check", {}),
+        "legal_analysis": {
+            "summary_points": union(all_of("summary_points", "legal_analysis")),
+            "red_flags": union(all_of("red_flags", "legal_analysis")),
+            "risk_score": max((score for score in scores if isinstance(score, (int, float))), default=0)
+        },
+        "suggested_places": [place for part in parts for place in part.get("suggested_places", [])]
+    }
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, GEMINI_BACKOFF_SECONDS * (2 ** attempt))
+
+def parse_response(response) -> dict:
+    clean_text = response.text.replace("```json", "").replace("```", "").strip()
+    return json.loads(clean_text)
+
+class GeminiAgent:
+    def __init__(self):
+        self.api_key = os.getenv("GEMINI_API_KEY")
+        # The SDK (~0.5s of imports) is only loaded when first needed; a failed load clears this
+        self.available = bool(self.api_key and self.api_key != "YOUR_API_KEY_HERE")
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._semaphore = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        """Imports and configures the Gemini SDK; called on first use or by the warm-up."""
+        if not self.available or self._model is not None:
+            return
+        with self._load_lock:
+            if self._model is not None:
+                return
+            try:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel('gemini-2.5-flash')
+                retryable_errors()
+            except Exception as e:
+                print(f"Gemini Init Error: {e}")
+                self.available = False
+
+    @property
+    def model(self):
+        self.load()
+        return self._model
+
+    async def analyze_document_async(self, file_content: bytes, mime_type: str = "application/pdf") -> dict:
+        """
+        Analyzes a document (PDF/Image) for both Legal Risks AND Signature Locations, alongside local extraction.
+        Returns a dict with 'legal_analysis' and 'suggested_places'.
         """
+        if not self.available:
+            return None
 
         try:
-            # Pass data inline (Gemini 1.5 supports this for reasonable sizes)
-            response = self.model.generate_content([
+            response = await self.generate_async([
                 {'mime_type': mime_type, 'data': file_content},
-                prompt
+                DOCUMENT_ANALYSIS_PROMPT
             ])
-            
-            clean_text = response.text.replace("```json", "").replace("```", "").strip()
-            return json.loads(clean_text)
+            return parse_response(response)
         except Exception as e:
             print(f"Gemini Document Analysis Error: {e}")
             return None
 
+    async def analyze_pages_async(self, page_texts: list[str], pdf_pages, need_places: bool = True) -> dict | None:
+        """
+        Chunked analysis of an extracted document (page_texts holds one string per page), shaped like analyze_document_async's.
+        With enough text, Gemini gets the text in page ranges instead of the PDF, plus (if need_places) a PDF of just the
+        likely signature pages for visual detection. Scanned documents are sent as PDFs, page range by page range.
+        Ranges are analysed in parallel and merged. pdf_pages(indices) must return (awaitably) a PDF of those pages.
+        """
+        if not self.available or not page_texts:
+            return None
+
+        page_count = len(page_texts)
+        lengths = [len(page.strip()) for page in page_texts]
+        try:
+            if sum(lengths) >= GEMINI_MIN_CHARS_PER_PAGE * page_count:
+                jobs = [self._analyze_text_range(page_texts, start, end) for start, end in page_ranges(lengths)]
+                if need_places:
+                    jobs.append(self._find_places(page_texts, pdf_pages))
+            else:
+                jobs = [self._analyze_pdf_range(pdf_pages, start, end) for start, end in page_ranges([0] * page_count)]
+            print(f"Gemini chunked analysis: {len(jobs)} calls for {page_count} pages")
+            parts = await asyncio.gather(*jobs)
+        except Exception as e:
+            print(f"Gemini Chunked Analysis Error: {e}")
+            return None
+        return merge_analyses(parts)
+
+    async def _analyze_text_range(self, page_texts: list[str], start: int, end: int) -> dict:
+        if (start, end) == (0, len(page_texts)):
+            part = "a document"
+        else:
+            part = f"pages {start + 1}-{end} of a {len(page_texts)}-page document"
+        body = "".join(f"\n--- Page {i + 1} ---\n{page_texts[i]}" for i in range(start, end))
+        response = await self.generate_async(TEXT_ANALYSIS_PROMPT.format(part=part) + body)
+        return parse_response(response)
+
+    async def _analyze_pdf_range(self, pdf_pages, start: int, end: int) -> dict:
+        pages = list(range(start, end))
+        response = await self.generate_async([
+            {'mime_type': 'application/pdf', 'data': await pdf_pages(pages)},
+            DOCUMENT_ANALYSIS_PROMPT
+        ])
+        result = parse_response(response)
+        result["suggested_places"] = remap_places(result.get("suggested_places", []), pages)
+        return result
+
+    async def _find_places(self, page_texts: list[str], pdf_pages) -> dict:
+        pages = likely_signature_pages(page_texts)
+        try:
+            response = await self.generate_async([
+                {'mime_type': 'application/pdf', 'data': await pdf_pages(pages)},
+                SIGNATURE_PLACES_PROMPT
+            ])
+            return {"suggested_places": remap_places(parse_response(response).get("suggested_places", []), pages)}
+        except Exception as e:
+            # The analysis itself is still usable without visual coordinates
+            print(f"Gemini Signature Detection Error: {e}")
+            return {"suggested_places": []}
+
+    async def generate_async(self, contents):
+        """
+        Async generate_content: at most GEMINI_MAX_CONCURRENCY calls in flight, per-attempt deadline,
+        jittered retries on transient errors. The model (and its gRPC channel) is reused across calls.
+        """
+        if not self.loaded:
+            # Keep the SDK import off the event loop
+            await asyncio.to_thread(self.load)
+        if not self.available:
+            raise RuntimeError("Gemini SDK failed to load")
+
+        async with self._get_semaphore():
+            for attempt in range(GEMINI_MAX_RETRIES + 1):
+                try:
+                    return await asyncio.wait_for(
+                        self.model.generate_content_async(contents, request_options={"timeout": GEMINI_TIMEOUT_SECONDS}),
+                        timeout=GEMINI_TIMEOUT_SECONDS
+                    )
+                except retryable_errors() as e:
+                    if attempt == GEMINI_MAX_RETRIES:
+                        raise
+                    delay = backoff_delay(attempt)
+                    print(f"Gemini transient error ({e}), retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the serving event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        return self._semaphore
+
 gemini_agent = GeminiAgent()
@@ -1,36 +1,288 @@
-import hashlib
+import asyncio
 import io
+import os
 import re
-from pypdf import PdfReader
-from sumy.parsers.plaintext import PlaintextParser
-from sumy.nlp.tokenizers import Tokenizer
-from sumy.summarizers.lsa import LsaSummarizer
-from sumy.nlp.stemmers import Stemmer
-from sumy.utils import get_stop_words
-import nltk
+from dataclasses import dataclass, field
+from typing import BinaryIO, TYPE_CHECKING
 from agents.legal_agent import legal_agent
-from agents.gemini_agent import gemini_agent
+from agents.summary_agent import summary_agent, SUMMARIZER_ENGINE
+from agents.gemini_agent import gemini_agent, GEMINI_ANALYSIS_MODE
+from services.cache_service import LRUCache
+from services.db_service import AsyncSessionLocal
+from services.analysis_store_service import analysis_store_service, load_result
+from services.singleflight_service import SingleFlight
+from services.upload_service import open_source, read_all
+from services.worker_pool import worker_pool
+from services.metrics_service import metrics_service
+
+if TYPE_CHECKING:
+    from pypdf import PdfReader
 
 # Removed Tesseract/Poppler dependencies as requested
 
-# Download NLTK data (run once)
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('punkt_tab')
+# Analysis results keyed by document SHA-256 (identical bytes => identical analysis)
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Version of the stored analysis format / pipeline; bump it to have stored analyses recomputed
+ANALYSIS_VERSION = 1
+
+# Strict keywords for signature fields, and common false positives to exclude
+SIGNATURE_KEYWORDS = ("sign here", "signature", "by:", "authorized signatory")
+SIGNATURE_FALSE_POSITIVES = ("design", "assignment", "significant")
+
+def is_signature_field(text: str) -> bool:
+    lower_text = text.lower()
+    if not any(k in lower_text for k in SIGNATURE_KEYWORDS):
+        return False
+    return not any(k in lower_text for k in SIGNATURE_FALSE_POSITIVES)
+
+def split_pages(text: str, page_offsets: list[int]) -> list[str]:
+    """Per-page text back out of the joined document text (pages are joined with a newline)."""
+    ends = [offset - 1 for offset in page_offsets[1:]] + [len(text)]
+    return [text[start:end] for start, end in zip(page_offsets, ends)]
+
+@dataclass
+class PageText:
+    """Everything extracted from one page in a single content-stream pass."""
+    page_num: int
+    text: str
+    width: float
+    height: float
+    signature_hits: list[dict] = field(default_factory=list)  # Suggested places found by keyword
+
+class PageVisitor:
+    """
+    pypdf visitor_text callback collecting signature keyword hits with their positions.
+    A single instance is reused across pages; call reset() before each page.
+    """
+    def reset(self, page_num: int):
+        self.page_num = page_num
+        self.hits = []
+
+    def __call__(self, text, cm, tm, font_dict, font_size):
+        if not text or not text.strip():
+            return
+        if len(text) < 50 and is_signature_field(text):
+            self.hits.append({
+                "page": self.page_num,
+                "x": float(tm[4]),
+                "y": float(tm[5]),
+                "label": text.strip()
+            })
+
+def analysis_engine() -> str:
+    """Tag of the pipeline currently producing analyses, stored alongside them."""
+    if gemini_agent.available:
+        return f"gemini/{GEMINI_ANALYSIS_MODE}"
+    return f"local/{SUMMARIZER_ENGINE}"
+
+async def timed_stage(stage: str, coro):
+    """Awaits coro, recording it as an ingestion stage; the Gemini calls report failure by returning None."""
+    with metrics_service.ingestion_stages.time(stage=stage) as timer:
+        result = await coro
+        if result is None:
+            timer.outcome = "error"
+        return result
 
 class IngestionAgent:
-    def process(self, file_content: bytes) -> tuple[str, str, str | None, list[dict], dict]:
+    def __init__(self):
+        self.cache = LRUCache("analysis", ANALYSIS_CACHE_MAX_BYTES)
+        # Concurrent uploads of the same document share one analysis (and one Gemini call)
+        self.flights = SingleFlight("analysis")
+
+    async def process_async(self, file_content: bytes | str, doc_hash: str, on_event=None, release=None) -> tuple[str, str, str | None, list[dict], dict]:
         """
-        Computes SHA-256 hash, generates summary, detects existing signature ID,
-        finds suggested signature locations, and performs legal risk analysis.
-        Returns (hash, summary, detected_sig_id, suggested_places, legal_analysis)
+        Analyses an uploaded document: generates the summary, detects an existing signature ID,
+        finds suggested signature locations and performs the legal risk analysis.
+        Returns (hash, summary, detected_sig_id, suggested_places, legal_analysis).
+        Repeated uploads of the same bytes are served from the analysis cache, then from the analysis store.
+        The CPU-bound local stages run in the worker pool so the event loop stays free,
+        and the Gemini call starts immediately and runs alongside them (latency ~ max(local, remote)).
+        file_content must be picklable: raw bytes or a file path (see SpooledUpload.source()).
+        on_event(stage, data), if given, is called as each stage completes:
+        text_extracted, summary_ready, legal_analysis_ready, signature_places_ready.
+        The cache lives in this (the serving) process so hits never touch the pool.
+        If the same document is already being analysed, this waits for that analysis instead of starting another
+        (file_content is then unused); it replays the events published so far and receives the rest.
+        release(), if given, frees file_content (e.g. SpooledUpload.close): it is called once nothing reads it any more,
+        so a temp file outlives a cancelled request for as long as the analysis other callers wait on still needs it.
         """
-        # Compute Hash
-        doc_hash = hashlib.sha256(file_content).hexdigest()
-        detected_sig_id = None
+        cached = self.cache.get(doc_hash)
+        if cached is not None:
+            if release is not None:
+                release()
+            self.replay(cached, on_event or (lambda stage, data: None))
+            return (doc_hash, *cached)
+
+        return await self.flights.run(doc_hash, lambda emit: self.analyze_async(file_content, doc_hash, emit), on_event, on_done=release)
+
+    def replay(self, result: tuple, emit):
+        """Publishes the stage events for an analysis that was already done."""
+        summary, detected_sig_id, suggested_places, legal_analysis = result
+        emit("text_extracted", {"detected_sig_id": detected_sig_id, "cached": True})
+        emit("summary_ready", {"summary": summary})
+        emit("legal_analysis_ready", {"legal_analysis": legal_analysis})
+        emit("signature_places_ready", {"suggested_places": suggested_places})
+
+    async def analyze_async(self, file_content: bytes | str, doc_hash: str, emit) -> tuple[str, str, str | None, list[dict], dict]:
+        """The uncached part of process_async(), run once per in-flight document: analysis store, else the pipeline."""
+        engine = analysis_engine()
+        try:
+            async with AsyncSessionLocal() as db:
+                stored = await analysis_store_service.get(db, doc_hash, engine, ANALYSIS_VERSION)
+                result = load_result(stored) if stored is not None else None
+        except Exception as e:
+            print(f"Analysis store read failed: {e}")
+            result = None
+        if result is not None:
+            self.cache.set(doc_hash, result)
+            self.replay(result, emit)
+            return (doc_hash, *result)
+
+        gemini_task = None
+        if gemini_agent.available and GEMINI_ANALYSIS_MODE == "document":
+            print("Using Gemini for Advanced Analysis...")
+            content = file_content if isinstance(file_content, bytes) else await asyncio.to_thread(read_all, file_content)
+            gemini_task = asyncio.create_task(timed_stage("gemini", gemini_agent.analyze_document_async(content)))
+
+        local = self.empty_local()
+        try:
+            with metrics_service.ingestion_stages.time(stage="extract"):
+                extracted = await worker_pool.run(run_extract, file_content)
+            text = extracted.pop("text")
+            local.update(extracted)
+            metrics_service.document_pages.observe(len(local["page_sizes"]))
+            metrics_service.document_bytes.observe(len(file_content) if isinstance(file_content, bytes) else os.path.getsize(file_content))
+            emit("text_extracted", {
+                "page_count": len(local["page_sizes"]),
+                "text_length": local["text_length"],
+                "detected_sig_id": local["detected_sig_id"]
+            })
+
+            if gemini_agent.available and gemini_task is None:
+                # Chunked mode works from the page text, so it starts after extraction and runs alongside the summary
+                print("Using Gemini for Advanced Analysis...")
+                gemini_task = asyncio.create_task(timed_stage("gemini", self.gemini_analysis(file_content, text, local)))
+
+            with metrics_service.ingestion_stages.time(stage="summarize"):
+                local["summary"] = await worker_pool.run(run_summarize, text, local["page_offsets"])
+            emit("summary_ready", {"summary": local["summary"]})
+
+            if gemini_task is None and text.strip():
+                print("Gemini not available, using LegalAgent")
+                with metrics_service.ingestion_stages.time(stage="legal_analysis"):
+                    local["legal_analysis"] = await worker_pool.run(run_legal_analysis, text, local["page_offsets"])
+        except asyncio.CancelledError:
+            if gemini_task is not None:
+                gemini_task.cancel()
+            raise
+        except Exception as e:
+            print(f"Ingestion Error: {e}")
+            local["error"] = str(e)
+
+        gemini_result = None
+        if gemini_task is not None:
+            if local["error"] is None:
+                gemini_result = await gemini_task
+            else:
+                gemini_task.cancel()
+
+        with metrics_service.ingestion_stages.time(stage="merge"):
+            result, ok = self.merge(local, gemini_result)
+        summary, detected_sig_id, suggested_places, legal_analysis = result
+        emit("legal_analysis_ready", {"legal_analysis": legal_analysis})
+        emit("signature_places_ready", {"suggested_places": suggested_places})
+        if ok:
+            self.cache.set(doc_hash, result)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await analysis_store_service.save(db, doc_hash, engine, ANALYSIS_VERSION, result)
+            except Exception as e:
+                print(f"Analysis store write failed: {e}")
+
+        return (doc_hash, *result)
+
+    async def gemini_analysis(self, file_content: bytes | str, text: str, local: dict) -> dict | None:
+        """Chunked Gemini analysis (see GeminiAgent.analyze_pages_async); sub-PDFs are cut in the worker pool."""
+        page_texts = split_pages(text, local["page_offsets"])
+
+        async def pdf_pages(pages: list[int]) -> bytes:
+            if pages == list(range(len(page_texts))):
+                return file_content if isinstance(file_content, bytes) else await asyncio.to_thread(read_all, file_content)
+            return await worker_pool.run(run_select_pages, file_content, pages)
+
+        # Same condition merge() uses to prefer Gemini's coordinates over the keyword hits
+        need_places = not local["suggested_places"] or local["text_length"] < 100
+        return await gemini_agent.analyze_pages_async(page_texts, pdf_pages, need_places)
+
+    def empty_local(self) -> dict:
+        return {
+            "error": None,
+            "text_length": 0,
+            "page_sizes": [],
+            "page_offsets": [],
+            "summary": None,
+            "detected_sig_id": None,
+            "suggested_places": [],
+            "legal_analysis": None
+        }
+
+    def extract(self, stream: BinaryIO) -> dict:
+        """
+        Extraction stage: document text, page sizes, keyword-based signature places and embedded signature ID.
+        """
+        from pypdf import PdfReader
+        reader = PdfReader(stream)
+
+        # 1. Try Standard Text Extraction (Fast, Local) - one content-stream pass per page
+        pages = self.extract_pages(reader)
+        text = "\n".join(page.text for page in pages)
         suggested_places = []
+        page_offsets = []
+        offset = 0
+        for page in pages:
+            suggested_places.extend(page.signature_hits)
+            page_offsets.append(offset)
+            offset += len(page.text) + 1
+
+        # 2. Detect Signature ID
+        detected_sig_id = None
+        match = re.search(r"Signed:\s*([a-zA-Z0-9]+)", text)
+        if match:
+            detected_sig_id = match.group(1)
+
+        return {
+            "text": text,
+            "text_length": len(text.strip()),
+            "page_sizes": [(page.width, page.height) for page in pages],
+            "page_offsets": page_offsets,
+            "suggested_places": suggested_places,
+            "detected_sig_id": detected_sig_id
+        }
+
+    def select_pages(self, stream: BinaryIO, pages: list[int]) -> bytes:
+        """A new PDF made of the given pages (0-based indices) of the document."""
+        from pypdf import PdfReader, PdfWriter
+        reader = PdfReader(stream)
+        writer = PdfWriter()
+        for i in pages:
+            writer.add_page(reader.pages[i])
+        out = io.BytesIO()
+        writer.write(out)
+        return out.getvalue()
+
+    def summarize(self, text: str, page_offsets: list[int] | None = None) -> str:
+        """Summary stage (engine selected by SUMMARIZER_ENGINE, see SummaryAgent)."""
+        if not text.strip():
+            return "No text extracted (Scanned Document)."
+        return summary_agent.summarize(text, page_offsets)
+
+    def merge(self, local: dict, gemini_result: dict | None) -> tuple[tuple[str, str | None, list[dict], dict], bool]:
+        """
+        Combines the local stage with the Gemini result (if any) into the final analysis.
+        Returns ((summary, detected_sig_id, suggested_places, legal_analysis), ok)
+        """
+        detected_sig_id = local["detected_sig_id"]
+        suggested_places = list(local["suggested_places"])
         legal_analysis = {
             "summary_points": [],
             "red_flags": [],
@@ -38,130 +290,105 @@ class IngestionAgent:
             "document_type": "Unknown",
             "executive_summary": "Analysis not available."
         }
-        
-        try:
-            reader = PdfReader(io.BytesIO(file_content))
-            text = ""
-            
-            # 1. Try Standard Text Extraction (Fast, Local)
-            for i, page in enumerate(reader.pages):
-                page_num = i + 1
-                page_text = page.extract_text()
-                text += page_text + "\n"
-                
-                # Visitor to find coordinates (Text based)
-                def visitor_body(text, cm, tm, fontDict, fontSize):
-                    if text and text.strip():
-                        lower_text = text.lower()
-                        # Strict keywords for signature fields
-                        is_signature_field = (
-                            "sign here" in lower_text or 
-                            "signature" in lower_text or 
-                            "by:" in lower_text or
-                            "authorized signatory" in lower_text
-                        )
-                        
-                        # Exclude common false positives
-                        if is_signature_field:
-                            if "design" in lower_text or "assignment" in lower_text or "significant" in lower_text:
-                                is_signature_field = False
-
-                        if is_signature_field:
-                            if len(text) < 50: 
-                                x = tm[4]
-                                y = tm[5]
-                                label = text.strip()
-                                suggested_places.append({
-                                    "page": page_num,
-                                    "x": float(x),
-                                    "y": float(y),
-                                    "label": label
-                                })
-
-                page.extract_text(visitor_text=visitor_body)
-            
-            # 2. Detect Signature ID
-            match = re.search(r"Signed:\s*([a-zA-Z0-9]+)", text)
-            if match:
-                detected_sig_id = match.group(1)
-
-            # 3. Generate Summary
-            if text.strip():
-                parser = PlaintextParser.from_string(text, Tokenizer("english"))
-                stemmer = Stemmer("english")
-                summarizer = LsaSummarizer(stemmer)
-                summarizer.stop_words = get_stop_words("english")
-                
-                summary_sentences = summarizer(parser.document, 3)
-                summary = " ".join([str(s) for s in summary_sentences])
-            else:
-                summary = "No text extracted (Scanned Document)."
 
-            # 4. Advanced Analysis (Gemini)
-            # Use Gemini if available. It handles both text analysis AND visual detection (for scanned docs)
-            if gemini_agent.available:
-                print("Using Gemini for Advanced Analysis...")
-                gemini_result = gemini_agent.analyze_document(file_content)
+        if local["error"] is not None:
+            return (f"Error: {local['error']}", detected_sig_id, suggested_places, legal_analysis), False
+
+        summary = local["summary"]
+        page_sizes = local["page_sizes"]
+        ok = True
+
+        # Advanced Analysis (Gemini)
+        # Use Gemini if available. It handles both text analysis AND visual detection (for scanned docs)
+        if gemini_agent.available:
+            if gemini_result:
+                # Flatten the result for easier frontend consumption
+                # gemini_result has keys: document_type, executive_summary, entities, validity_check, legal_analysis, suggested_places
+                
+                # 1. Extract core analysis
+                legal_analysis = {
+                    "document_type": gemini_result.get("document_type", "Unknown"),
+                    "executive_summary": gemini_result.get("executive_summary", "No summary provided."),
+                    "entities": gemini_result.get("entities", {}),
+                    "validity_check": gemini_result.get("validity_check", {}),
+                    # Merge nested legal_analysis (risk score, red flags)
+                    **gemini_result.get("legal_analysis", {})
+                }
                 
-                if gemini_result:
-                    # Flatten the result for easier frontend consumption
-                    # gemini_result has keys: document_type, executive_summary, entities, validity_check, legal_analysis, suggested_places
-                    
-                    # 1. Extract core analysis
-                    legal_analysis = {
-                        "document_type": gemini_result.get("document_type", "Unknown"),
-                        "executive_summary": gemini_result.get("executive_summary", "No summary provided."),
-                        "entities": gemini_result.get("entities", {}),
-                        "validity_check": gemini_result.get("validity_check", {}),
-                        # Merge nested legal_analysis (risk score, red flags)
-                        **gemini_result.get("legal_analysis", {})
-                    }
-                    
-                    # 2. Update Suggested Places (if local failed or for better accuracy)
-                    if "suggested_places" in gemini_result and (len(suggested_places) == 0 or len(text.strip()) < 100):
-                        print("Using Gemini Visual Coordinates...")
-                        for place in gemini_result["suggested_places"]:
-                            p_num = place.get("page", 1)
-                            box = place.get("box_2d", [0, 0, 0, 0]) # ymin, xmin, ymax, xmax (0-1000)
-                            label = place.get("label", "Sign Here")
+                # 2. Update Suggested Places (if local failed or for better accuracy)
+                if "suggested_places" in gemini_result and (len(suggested_places) == 0 or local["text_length"] < 100):
+                    print("Using Gemini Visual Coordinates...")
+                    for place in gemini_result["suggested_places"]:
+                        p_num = place.get("page", 1)
+                        box = place.get("box_2d", [0, 0, 0, 0]) # ymin, xmin, ymax, xmax (0-1000)
+                        label = place.get("label", "Sign Here")
+                        
+                        # Convert 0-1000 to PDF Point coordinates
+                        if p_num <= len(page_sizes):
+                            pdf_w, pdf_h = page_sizes[p_num - 1]
                             
-                            # Convert 0-1000 to PDF Point coordinates
-                            if p_num <= len(reader.pages):
-                                page = reader.pages[p_num - 1]
-                                pdf_w = float(page.mediabox.width)
-                                pdf_h = float(page.mediabox.height)
-                                
-                                ymin, xmin, ymax, xmax = box
-                                
-                                # x = xmin * width / 1000
-                                x_pdf = (xmin / 1000.0) * pdf_w
-                                
-                                # y = (1000 - ymax) * height / 1000  (Flip Y axis)
-                                y_pdf = (1.0 - (ymax / 1000.0)) * pdf_h
-                                
-                                suggested_places.append({
-                                    "page": p_num,
-                                    "x": float(x_pdf),
-                                    "y": float(y_pdf),
-                                    "label": label
-                                })
-
-            elif text.strip():
-                # Fallback to local heuristic if Gemini not available
-                print("Gemini not available, using LegalAgent")
-                legal_analysis = legal_agent.analyze(text)
-                # Add default fields for intelligence
-                legal_analysis["document_type"] = "Unknown (Local Analysis)"
-                legal_analysis["executive_summary"] = summary
+                            ymin, xmin, ymax, xmax = box
+                            
+                            # x = xmin * width / 1000
+                            x_pdf = (xmin / 1000.0) * pdf_w
+                            
+                            # y = (1000 - ymax) * height / 1000  (Flip Y axis)
+                            y_pdf = (1.0 - (ymax / 1000.0)) * pdf_h
+                            
+                            suggested_places.append({
+                                "page": p_num,
+                                "x": float(x_pdf),
+                                "y": float(y_pdf),
+                                "label": label
+                            })
             else:
-                legal_analysis["summary_points"].append("Could not analyze (Scanned doc & No Gemini Key).")
+                # Don't cache a degraded result; retry Gemini on the next upload
+                ok = False
 
-        except Exception as e:
-            print(f"Ingestion Error: {e}")
-            import traceback
-            traceback.print_exc()
-            summary = f"Error: {str(e)}"
+        elif local["legal_analysis"] is not None:
+            # Fallback to local heuristic if Gemini not available
+            legal_analysis = local["legal_analysis"]
+            # Add default fields for intelligence
+            legal_analysis["document_type"] = "Unknown (Local Analysis)"
+            legal_analysis["executive_summary"] = summary
+        else:
+            legal_analysis["summary_points"].append("Could not analyze (Scanned doc & No Gemini Key).")
 
-        return doc_hash, summary, detected_sig_id, suggested_places, legal_analysis
+        return (summary, detected_sig_id, suggested_places, legal_analysis), ok
+
+    def extract_pages(self, reader: "PdfReader") -> list[PageText]:
+        """
+        Extracts text and signature keyword hits for every page,
+        parsing each page's content stream exactly once.
+        """
+        visitor = PageVisitor()
+        pages = []
+        for i, page in enumerate(reader.pages):
+            visitor.reset(i + 1)
+            page_text = page.extract_text(visitor_text=visitor)
+            pages.append(PageText(
+                page_num=i + 1,
+                text=page_text,
+                width=float(page.mediabox.width),
+                height=float(page.mediabox.height),
+                signature_hits=visitor.hits
+            ))
+        return pages
 
 ingestion_agent = IngestionAgent()
+
+# Worker pool entry points (module-level so they can be pickled)
+
+def run_extract(file_content: bytes | str) -> dict:
+    with open_source(file_content) as stream:
+        return ingestion_agent.extract(stream)
+
+def run_summarize(text: str, page_offsets: list[int] | None = None) -> str:
+    return ingestion_agent.summarize(text, page_offsets)
+
+def run_legal_analysis(text: str, page_offsets: list[int] | None = None) -> dict:
+    return legal_agent.analyze(text, page_offsets)
+
+def run_select_pages(file_content: bytes | str, pages: list[int]) -> bytes:
+    with open_source(file_content) as stream:
+        return ingestion_agent.select_pages(stream, pages)
@@ -1,68 +1,198 @@
+import os
 import re
+import json
+from bisect import bisect_right
+from dataclasses import dataclass, field
+
+LEGAL_RULES_PATH = os.getenv("LEGAL_RULES_PATH", os.path.join(os.path.dirname(__file__), "legal_rules.json"))
+# Clause locations reported per rule, to bound the response on long contracts
+LEGAL_MAX_CLAUSES_PER_RULE = int(os.getenv("LEGAL_MAX_CLAUSES_PER_RULE", "10"))
+
+RULE_KINDS = ("summary_point", "red_flag")
+
+@dataclass
+class LegalRule:
+    """
+    One entry of legal_rules.json. A rule fires when any of its keywords (case-insensitive substrings)
+    or its regex pattern occurs in the text, unless one of the `unless` keywords occurs anywhere
+    or a rule listed in `suppressed_by` also matched.
+    Patterns run against the lowercased text and may use numbered groups, referenced from the message
+    as {1}, {2}... ({0} is the whole match), but not backreferences or named groups,
+    since all patterns are combined into one regex.
+    """
+    id: str
+    kind: str
+    message: str
+    keywords: list[str] = field(default_factory=list)
+    pattern: str | None = None
+    unless: list[str] = field(default_factory=list)
+    suppressed_by: list[str] = field(default_factory=list)
+    score: int = 0
+
+def load_rules(path: str) -> list[LegalRule]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    rules = []
+    for entry in data["rules"]:
+        rule = LegalRule(**entry)
+        rule.keywords = [keyword.lower() for keyword in rule.keywords]
+        rule.unless = [keyword.lower() for keyword in rule.unless]
+        if rule.kind not in RULE_KINDS:
+            raise ValueError(f"Legal rule {rule.id}: kind must be one of {RULE_KINDS}")
+        if not rule.keywords and not rule.pattern:
+            raise ValueError(f"Legal rule {rule.id}: needs keywords or a pattern")
+        rules.append(rule)
+
+    ids = {rule.id for rule in rules}
+    if len(ids) != len(rules):
+        raise ValueError("Legal rule ids must be unique")
+    for rule in rules:
+        unknown = set(rule.suppressed_by) - ids
+        if unknown:
+            raise ValueError(f"Legal rule {rule.id}: suppressed_by references unknown rules {sorted(unknown)}")
+    return rules
+
+def keyword_trie_pattern(keywords: list[str]) -> str:
+    """
+    Regex alternation of the keywords factored into a prefix trie, e.g. "pe(?:nalty|rpetual)".
+    sre then tries one branch per character instead of every keyword at every position,
+    and the greedy "?" on shorter keywords makes the longest keyword win.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: dict) -> str:
+        is_end = "" in node
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 and not is_end else "(?:" + "|".join(branches) + ")"
+        return body + "?" if is_end else body
+
+    return emit(trie)
+
+class RuleSet:
+    """
+    Rules compiled into two regexes, one for all keywords and one for all patterns,
+    so the text is scanned twice no matter how many rules there are.
+    Keywords are kept apart because a pure-literal alternation lets sre skip ahead on the first character,
+    which mixing in arbitrary patterns would disable.
+    """
+    def __init__(self, rules: list[LegalRule]):
+        self.rules = rules
+
+        branches = []
+        self.patterns = {}  # group name -> (rule, compiled pattern)
+        for i, rule in enumerate(rules):
+            if rule.pattern:
+                name = f"rule{i}"
+                branches.append(f"(?P<{name}>{rule.pattern})")
+                self.patterns[name] = (rule, re.compile(rule.pattern))
+        self.pattern_regex = re.compile("|".join(branches)) if branches else None
+
+        self.keyword_rules = {}  # keyword -> rules it triggers
+        keywords = set()
+        for rule in rules:
+            keywords.update(rule.unless)
+            for keyword in rule.keywords:
+                keywords.add(keyword)
+                self.keyword_rules.setdefault(keyword, []).append(rule)
+
+        ordered = sorted(keywords, key=len, reverse=True)
+        self.keyword_regex = re.compile(keyword_trie_pattern(ordered)) if ordered else None
+
+        # The scan doesn't overlap, so a long keyword hides the shorter keywords inside it; credit those too
+        self.contained = {keyword: [(other, keyword.index(other)) for other in ordered if other != keyword and other in keyword]
+                          for keyword in ordered}
 
 class LegalAgent:
-    def analyze(self, text: str) -> dict:
+    def __init__(self, rules_path: str = LEGAL_RULES_PATH):
+        self.ruleset = RuleSet(load_rules(rules_path))
+
+    def analyze(self, text: str, page_offsets: list[int] | None = None) -> dict:
         """
         Analyzes the contract text for key terms and red flags.
+        page_offsets, if given, holds the offset in text where each page starts, so clauses get a page number.
         """
         analysis = {
             "summary_points": [],
             "red_flags": [],
-            "risk_score": 0 # 0-100
+            "risk_score": 0, # 0-100
+            "clauses": []
         }
-        
+
         lower_text = text.lower()
-        
-        # 1. Term / Duration
-        term_match = re.search(r"(term|duration) of this agreement shall be for a period of\s*(\d+\s*\w+)", lower_text)
-        if term_match:
-            analysis["summary_points"].append(f"Contract Duration: {term_match.group(2)}")
-        
-        # 2. Termination
-        if "termination for convenience" in lower_text:
-            analysis["summary_points"].append("Includes 'Termination for Convenience' clause (can be cancelled anytime).")
-        elif "termination" in lower_text:
-             analysis["summary_points"].append("Contains standard termination clauses.")
-
-        # 3. Red Flags & Risks
-        
-        # Indefinite / Perpetual
-        if "indefinite" in lower_text or "perpetual" in lower_text:
-            if "license" not in lower_text: # Perpetual license is often okay, perpetual NDA is not
-                analysis["red_flags"].append("Contains 'Indefinite' or 'Perpetual' obligations.")
-                analysis["risk_score"] += 20
-        
-        # Non-Compete
-        if "non-compete" in lower_text or "non compete" in lower_text:
-            analysis["red_flags"].append("Contains a Non-Compete clause. Verify the duration and scope.")
-            analysis["risk_score"] += 30
-            
-        # Jurisdiction
-        if "jurisdiction" in lower_text:
-            # Simple check for common remote jurisdictions (example)
-            if "delaware" not in lower_text and "california" not in lower_text and "new york" not in lower_text:
-                 analysis["summary_points"].append("Check Jurisdiction clause (might be a specific foreign state).")
-
-        # Penalty / Liquidated Damages
-        if "liquidated damages" in lower_text or "penalty" in lower_text:
-            analysis["red_flags"].append("Contains 'Liquidated Damages' or 'Penalty' clauses.")
-            analysis["risk_score"] += 15
-            
-        # Arbitration
-        if "arbitration" in lower_text:
-            analysis["summary_points"].append("Requires Arbitration (waives right to court trial).")
-            
-        # Indemnification
-        if "indemnify" in lower_text or "hold harmless" in lower_text:
-             analysis["summary_points"].append("Contains Indemnification obligations (you pay for their losses).")
-             analysis["risk_score"] += 10
+        # A few non-ASCII characters lowercase to two; then map offsets in lower_text back to offsets in text
+        positions = None
+        if len(lower_text) != len(text):
+            positions = [i for i, ch in enumerate(text) for _ in ch.lower()]
+            positions.append(len(text))
+
+        found_keywords = set()
+        hits = {}  # rule id -> [(start, end)]
+        first_match = {}  # rule id -> match of its own pattern, for the message
+        if self.ruleset.pattern_regex is not None:
+            for match in self.ruleset.pattern_regex.finditer(lower_text):
+                rule, pattern = self.ruleset.patterns[match.lastgroup]
+                self._add_hit(hits, rule, match.start(), match.end())
+                if rule.id not in first_match:
+                    first_match[rule.id] = pattern.match(lower_text, match.start())
+
+        if self.ruleset.keyword_regex is not None:
+            for match in self.ruleset.keyword_regex.finditer(lower_text):
+                keyword = match.group()
+                for found, offset in [(keyword, 0), *self.ruleset.contained[keyword]]:
+                    found_keywords.add(found)
+                    start = match.start() + offset
+                    for rule in self.ruleset.keyword_rules.get(found, ()):
+                        self._add_hit(hits, rule, start, start + len(found))
+
+        for rule in self.ruleset.rules:
+            if rule.id not in hits:
+                continue
+            if any(keyword in found_keywords for keyword in rule.unless):
+                continue
+            if any(other in hits for other in rule.suppressed_by):
+                continue
+
+            if rule.id in first_match:
+                rule_match = first_match[rule.id]
+                message = rule.message.format(rule_match.group(0), *(group or "" for group in rule_match.groups()))
+            else:
+                message = rule.message
+            analysis["summary_points" if rule.kind == "summary_point" else "red_flags"].append(message)
+            analysis["risk_score"] += rule.score
+
+            for start, end in hits[rule.id]:
+                if positions is not None:
+                    start, end = positions[start], positions[end - 1] + 1
+                analysis["clauses"].append({
+                    "rule": rule.id,
+                    "text": text[start:end],
+                    "start": start,
+                    "end": end,
+                    "page": bisect_right(page_offsets, start) if page_offsets else None
+                })
+
+        analysis["clauses"].sort(key=lambda clause: clause["start"])
 
         # Cap Risk Score
         analysis["risk_score"] = min(analysis["risk_score"], 100)
-        
+
         if not analysis["summary_points"] and not analysis["red_flags"]:
             analysis["summary_points"].append("No specific key terms detected. Standard review recommended.")
 
         return analysis
 
+    @staticmethod
+    def _add_hit(hits: dict, rule: LegalRule, start: int, end: int):
+        rule_hits = hits.setdefault(rule.id, [])
+        if len(rule_hits) < LEGAL_MAX_CLAUSES_PER_RULE:
+            rule_hits.append((start, end))
+
 legal_agent = LegalAgent()
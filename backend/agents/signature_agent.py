@@ -1,8 +1,10 @@
+import asyncio
 from datetime import datetime
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from services.crypto_service import crypto_service
 from services.db_service import Signature
-from models.signature_model import SignatureResponse
+from models.signature_model import SignatureCreate, SignatureResponse, SignatureBatchItem
 
 class SignatureAgent:
     def process(self, db: Session, doc_hash: str, signer_email: str, summary: str | None = None, save: bool = True) -> SignatureResponse:
@@ -37,4 +39,80 @@ class SignatureAgent:
             summary=summary
         )
 
+    async def process_async(self, db: AsyncSession, doc_hash: str, signer_email: str, summary: str | None = None, save: bool = True) -> SignatureResponse:
+        """
+        process() for async routes: RSA signing on the crypto thread pool, non-blocking DB write.
+        """
+        timestamp = datetime.utcnow()
+        payload = f"{doc_hash}|{signer_email}|{timestamp.isoformat()}"
+
+        loop = asyncio.get_running_loop()
+        signature_b64 = await loop.run_in_executor(crypto_service.executor, crypto_service.sign_payload, payload)
+        sig_id = crypto_service.generate_sig_id(signature_b64)
+
+        if save:
+            db.add(Signature(
+                sig_id=sig_id,
+                doc_hash=doc_hash,
+                signer_email=signer_email,
+                signature=signature_b64,
+                timestamp=timestamp,
+                summary=summary
+            ))
+            await db.commit()
+
+        return SignatureResponse(
+            sig_id=sig_id,
+            timestamp=timestamp,
+            signature=signature_b64,
+            summary=summary
+        )
+
+    def process_batch(self, db: Session, items: list[SignatureCreate], save: bool = False) -> list[SignatureBatchItem]:
+        """
+        Signs many document hashes in parallel. If save is True, all rows are inserted in one transaction.
+        Returns one SignatureBatchItem per input, in input order; failures carry an error instead of a result.
+        """
+        timestamp = datetime.utcnow()
+        payloads = [f"{item.doc_hash}|{item.signer_email}|{timestamp.isoformat()}" for item in items]
+        signatures = crypto_service.sign_many(payloads)
+
+        results = []
+        rows = []
+        for index, (item, signature_b64) in enumerate(zip(items, signatures)):
+            if isinstance(signature_b64, Exception):
+                results.append(SignatureBatchItem(index=index, error=str(signature_b64)))
+                continue
+
+            sig_id = crypto_service.generate_sig_id(signature_b64)
+            results.append(SignatureBatchItem(index=index, result=SignatureResponse(
+                sig_id=sig_id,
+                timestamp=timestamp,
+                signature=signature_b64,
+                summary=item.summary
+            )))
+            if save:
+                rows.append(Signature(
+                    sig_id=sig_id,
+                    doc_hash=item.doc_hash,
+                    signer_email=item.signer_email,
+                    signature=signature_b64,
+                    timestamp=timestamp,
+                    summary=item.summary
+                ))
+
+        if rows:
+            try:
+                db.add_all(rows)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                # Nothing was saved; report it on every item that would have been
+                for item in results:
+                    if item.result is not None:
+                        item.result = None
+                        item.error = f"Save failed: {e}"
+
+        return results
+
 signature_agent = SignatureAgent()
@@ -0,0 +1,195 @@
+import os
+import re
+import functools
+from collections import Counter
+
+# NumPy, Sumy and NLTK are imported on first use (or by load()), keeping them out of process start-up
+
+# "lsa" (Sumy, exact but superlinear), "textrank" (bounded NumPy TextRank) or
+# "auto" (LSA up to SUMMARY_LSA_MAX_SENTENCES sentences, TextRank above)
+SUMMARIZER_ENGINE = os.getenv("SUMMARIZER_ENGINE", "auto").lower()
+SUMMARY_SENTENCES = int(os.getenv("SUMMARY_SENTENCES", "3"))
+SUMMARY_LSA_MAX_SENTENCES = int(os.getenv("SUMMARY_LSA_MAX_SENTENCES", "300"))
+# Hard caps for TextRank: the TF-IDF matrix is at most MAX_SENTENCES x MAX_VOCABULARY float32
+SUMMARY_MAX_SENTENCES = int(os.getenv("SUMMARY_MAX_SENTENCES", "1000"))
+SUMMARY_MAX_VOCABULARY = int(os.getenv("SUMMARY_MAX_VOCABULARY", "2000"))
+# Long documents are ranked per chunk of pages first, then the chunk winners are ranked against each other
+SUMMARY_CHUNK_PAGES = int(os.getenv("SUMMARY_CHUNK_PAGES", "20"))
+SUMMARY_SENTENCES_PER_CHUNK = int(os.getenv("SUMMARY_SENTENCES_PER_CHUNK", "5"))
+
+# Pre-provisioned NLTK data (python -m nltk.downloader -d nltk_data punkt_tab), searched before NLTK's defaults
+NLTK_DATA_DIR = os.getenv("NLTK_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nltk_data"))
+# Downloading at runtime hangs or fails without network, so it's opt-in
+NLTK_ALLOW_DOWNLOAD = os.getenv("NLTK_ALLOW_DOWNLOAD", "false").lower() == "true"
+
+# Sentences end at . ! ? and, in PDF text, at line breaks after labels such as "Signature:"
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|(?<=:)[ \t]*\n\s*")
+# Fragments with fewer content words (headings, form labels) aren't summary candidates
+SUMMARY_MIN_WORDS = 3
+WORD = re.compile(r"[a-z][a-z'-]+")
+
+@functools.cache
+def stop_words() -> frozenset:
+    from sumy.utils import get_stop_words
+    return frozenset(get_stop_words("english"))
+
+@functools.cache
+def ensure_nltk_data() -> None:
+    """
+    Makes the punkt tokenizer (used by Sumy's LSA path) available, from NLTK_DATA_DIR if provisioned.
+    Raises LookupError if it's missing and NLTK_ALLOW_DOWNLOAD is off.
+    """
+    import nltk
+    if os.path.isdir(NLTK_DATA_DIR) and NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_DIR)
+    try:
+        nltk.data.find("tokenizers/punkt_tab/english/")
+    except LookupError:
+        if not NLTK_ALLOW_DOWNLOAD:
+            raise LookupError(f"NLTK punkt_tab data not found; provision it with: python -m nltk.downloader -d {NLTK_DATA_DIR} punkt_tab")
+        nltk.download("punkt_tab", download_dir=NLTK_DATA_DIR, quiet=True)
+        if NLTK_DATA_DIR not in nltk.data.path:
+            nltk.data.path.insert(0, NLTK_DATA_DIR)
+
+def split_sentences(text: str) -> list[str]:
+    """Cheap regex splitter; PDF line breaks inside sentences are folded into spaces."""
+    sentences = []
+    for sentence in SENTENCE_SPLIT.split(text):
+        sentence = " ".join(sentence.split())
+        if len(sentence) > 1:
+            sentences.append(sentence)
+    return sentences
+
+def pagerank(similarity: "np.ndarray", damping: float = 0.85, max_iter: int = 100, tol: float = 1e-6) -> "np.ndarray":
+    import numpy as np
+    n = similarity.shape[0]
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    # Sentences with no overlap link to every sentence equally
+    transition = np.divide(similarity, row_sums, out=np.full_like(similarity, 1.0 / n), where=row_sums > 0)
+    scores = np.full(n, 1.0 / n, dtype=similarity.dtype)
+    for _ in range(max_iter):
+        updated = (1 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+class SummaryAgent:
+    def __init__(self):
+        self.lsa_available = True  # Cleared when the punkt data turns out to be missing
+
+    def load(self) -> None:
+        """Warm-up: imports the NLP stack ahead of the first request."""
+        import numpy  # noqa: F401
+        stop_words()
+        if SUMMARIZER_ENGINE != "textrank":
+            try:
+                ensure_nltk_data()
+                import sumy.summarizers.lsa  # noqa: F401
+                import sumy.nlp.tokenizers  # noqa: F401
+            except LookupError as e:
+                self.lsa_available = False
+                print(f"WARNING: LSA summariser unavailable, using TextRank: {e}")
+
+    def summarize(self, text: str, page_offsets: list[int] | None = None, engine: str | None = None) -> str:
+        """
+        Returns a SUMMARY_SENTENCES-sentence extractive summary of text.
+        page_offsets (start of each page in text) enables chunked summarisation of long documents.
+        """
+        engine = engine or SUMMARIZER_ENGINE
+        if engine == "auto":
+            engine = "lsa" if len(split_sentences(text)) <= SUMMARY_LSA_MAX_SENTENCES else "textrank"
+        if engine == "lsa":
+            if self.lsa_available:
+                try:
+                    return self.lsa(text)
+                except LookupError as e:
+                    self.lsa_available = False
+                    print(f"WARNING: LSA summariser unavailable, using TextRank: {e}")
+            engine = "textrank"
+        if engine == "textrank":
+            return self.textrank(text, page_offsets)
+        raise ValueError(f"Unknown SUMMARIZER_ENGINE: {engine}")
+
+    def lsa(self, text: str) -> str:
+        """Sumy LSA, the original summariser."""
+        ensure_nltk_data()
+        from sumy.parsers.plaintext import PlaintextParser
+        from sumy.nlp.tokenizers import Tokenizer
+        from sumy.summarizers.lsa import LsaSummarizer
+        from sumy.nlp.stemmers import Stemmer
+
+        parser = PlaintextParser.from_string(text, Tokenizer("english"))
+        stemmer = Stemmer("english")
+        summarizer = LsaSummarizer(stemmer)
+        summarizer.stop_words = stop_words()
+
+        summary_sentences = summarizer(parser.document, SUMMARY_SENTENCES)
+        return " ".join([str(s) for s in summary_sentences])
+
+    def textrank(self, text: str, page_offsets: list[int] | None = None) -> str:
+        """
+        TextRank over TF-IDF cosine similarity. Chunks of SUMMARY_CHUNK_PAGES pages are ranked separately,
+        keeping SUMMARY_SENTENCES_PER_CHUNK candidates each, so memory stays bounded however long the document.
+        """
+        chunks = self.chunk_pages(text, page_offsets)
+        if len(chunks) == 1:
+            candidates = split_sentences(chunks[0])
+        else:
+            candidates = []
+            for chunk in chunks:
+                candidates.extend(self.rank(split_sentences(chunk), SUMMARY_SENTENCES_PER_CHUNK))
+        return " ".join(self.rank(candidates, SUMMARY_SENTENCES))
+
+    def chunk_pages(self, text: str, page_offsets: list[int] | None) -> list[str]:
+        if not page_offsets or SUMMARY_CHUNK_PAGES <= 0 or len(page_offsets) <= SUMMARY_CHUNK_PAGES:
+            return [text]
+        starts = page_offsets[::SUMMARY_CHUNK_PAGES]
+        return [text[start:end] for start, end in zip(starts, [*starts[1:], len(text)])]
+
+    def rank(self, sentences: list[str], count: int) -> list[str]:
+        """Top `count` sentences by TextRank score, in document order."""
+        import numpy as np
+        if len(sentences) > SUMMARY_MAX_SENTENCES:
+            # Evenly spaced sample keeps coverage of the whole chunk
+            keep = np.linspace(0, len(sentences) - 1, SUMMARY_MAX_SENTENCES).astype(int)
+            sentences = [sentences[i] for i in keep]
+        if len(sentences) <= count:
+            return sentences
+
+        stops = stop_words()
+        tokens = [[word for word in WORD.findall(sentence.lower()) if word not in stops] for sentence in sentences]
+        if any(len(words) >= SUMMARY_MIN_WORDS for words in tokens):
+            kept = [i for i, words in enumerate(tokens) if len(words) >= SUMMARY_MIN_WORDS]
+            sentences = [sentences[i] for i in kept]
+            tokens = [tokens[i] for i in kept]
+            if len(sentences) <= count:
+                return sentences
+        document_frequency = Counter(word for words in tokens for word in set(words))
+        vocabulary = {word: i for i, (word, _) in enumerate(document_frequency.most_common(SUMMARY_MAX_VOCABULARY))}
+        if not vocabulary:
+            return sentences[:count]
+
+        rows, cols = [], []
+        for i, words in enumerate(tokens):
+            for word in words:
+                j = vocabulary.get(word)
+                if j is not None:
+                    rows.append(i)
+                    cols.append(j)
+        tf = np.zeros((len(sentences), len(vocabulary)), dtype=np.float32)
+        np.add.at(tf, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), 1.0)
+
+        df = np.array([document_frequency[word] for word in vocabulary], dtype=np.float32)
+        tfidf = tf * (np.log(len(sentences) / df) + 1.0)
+        norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+        np.divide(tfidf, norms, out=tfidf, where=norms > 0)
+
+        similarity = tfidf @ tfidf.T
+        np.fill_diagonal(similarity, 0.0)
+        scores = pagerank(similarity)
+
+        top = np.sort(np.argsort(-scores, kind="stable")[:count])
+        return [sentences[i] for i in top]
+
+summary_agent = SummaryAgent()
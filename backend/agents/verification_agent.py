@@ -1,38 +1,121 @@
+import os
+import asyncio
+import hashlib
+from typing import Iterator
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from services.crypto_service import crypto_service
 from services.db_service import Signature
+from services.cache_service import LRUCache
 from models.signature_model import VerificationResponse
 
+# Max number of values per IN (...) query in batch verification
+VERIFY_BATCH_CHUNK_SIZE = int(os.getenv("VERIFY_BATCH_CHUNK_SIZE", "500"))
+# Signature rows are immutable, so RSA verdicts can be memoized
+VERIFY_CACHE_MAX_ENTRIES = int(os.getenv("VERIFY_CACHE_MAX_ENTRIES", "100000"))
+
+def build_payload(record: Signature) -> str:
+    return f"{record.doc_hash}|{record.signer_email}|{record.timestamp.isoformat()}"
+
+def chunked(values: list, size: int) -> Iterator[list]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
 class VerificationAgent:
-    def verify_by_id(self, db: Session, sig_id: str) -> VerificationResponse:
+    def __init__(self):
+        self.cache = LRUCache("verification", max_entries=VERIFY_CACHE_MAX_ENTRIES)
+
+    async def verify_by_id_async(self, db: AsyncSession, sig_id: str) -> VerificationResponse:
         """
-        Verifies a signature by its ID.
+        Verifies a signature by its ID: non-blocking DB read, RSA check on the crypto thread pool.
         """
-        record = db.query(Signature).filter(Signature.sig_id == sig_id).first()
+        record = await db.get(Signature, sig_id)
         if not record:
             return VerificationResponse(valid=False)
-            
-        payload = f"{record.doc_hash}|{record.signer_email}|{record.timestamp.isoformat()}"
-        
-        is_valid = crypto_service.verify_signature(payload, record.signature)
-        
+
+        loop = asyncio.get_running_loop()
+        verdicts = await loop.run_in_executor(crypto_service.executor, self.check_many, [record])
+        return self.to_response(record, verdicts[0])
+
+    def check_many(self, records: list[Signature]) -> list[bool]:
+        """
+        RSA-PSS verdicts for the given records, served from the verification cache when possible.
+        Cache keys are the sig_id plus a digest of the signed payload and stored signature,
+        so a modified row never reuses a stale verdict.
+        Keys are loaded once per process, so rotating them means a restart, which also empties this cache.
+        """
+        crypto_service.ensure_keys()
+
+        verdicts = [None] * len(records)
+        pending = []
+        for i, record in enumerate(records):
+            payload = build_payload(record)
+            digest = hashlib.sha256(f"{payload}|{record.signature}".encode()).hexdigest()
+            key = (record.sig_id, digest)
+            cached = self.cache.get(key)
+            if cached is not None:
+                verdicts[i] = cached
+            else:
+                pending.append((i, key, payload, record.signature))
+
+        if len(pending) == 1:
+            i, key, payload, signature = pending[0]
+            results = [crypto_service.verify_signature(payload, signature)]
+        else:
+            results = crypto_service.verify_many([(payload, signature) for _, _, payload, signature in pending])
+
+        for (i, key, _, _), is_valid in zip(pending, results):
+            self.cache.set(key, is_valid)
+            verdicts[i] = is_valid
+
+        return verdicts
+
+    def to_response(self, record: Signature, is_valid: bool) -> VerificationResponse:
         if is_valid:
             return VerificationResponse(
                 valid=True,
+                sig_id=record.sig_id,
                 signer_email=record.signer_email,
                 timestamp=record.timestamp,
                 doc_hash=record.doc_hash,
                 summary=record.summary
             )
         else:
-            return VerificationResponse(valid=False)
+            return VerificationResponse(valid=False, sig_id=record.sig_id)
+
+    def verify_batch(self, db: Session, sig_ids: list[str], doc_hashes: list[str]) -> Iterator[VerificationResponse]:
+        """
+        Verifies many signatures, yielding results as they are produced so callers can stream them.
+        Records are fetched VERIFY_BATCH_CHUNK_SIZE at a time with IN (...) queries and the RSA checks
+        of each chunk run in parallel. sig_ids are answered in input order, one result each;
+        each doc_hash yields one result per matching signature, or a single invalid result if none exist.
+        """
+        for chunk in chunked(sig_ids, VERIFY_BATCH_CHUNK_SIZE):
+            records = db.query(Signature).filter(Signature.sig_id.in_(chunk)).all()
+            verdicts = self.check_many(records)
+            by_id = {r.sig_id: self.to_response(r, ok) for r, ok in zip(records, verdicts)}
+            db.expunge_all()  # Keep the identity map (and memory) flat across chunks
+            for sig_id in chunk:
+                yield by_id.get(sig_id) or VerificationResponse(valid=False, sig_id=sig_id)
+
+        for chunk in chunked(doc_hashes, VERIFY_BATCH_CHUNK_SIZE):
+            records = db.query(Signature).filter(Signature.doc_hash.in_(chunk)).all()
+            verdicts = self.check_many(records)
+            by_hash = {}
+            for r, ok in zip(records, verdicts):
+                by_hash.setdefault(r.doc_hash, []).append(self.to_response(r, ok))
+            db.expunge_all()
+            for doc_hash in chunk:
+                yield from by_hash.get(doc_hash) or [VerificationResponse(valid=False, doc_hash=doc_hash)]
 
-    def verify_by_upload(self, db: Session, file_hash: str) -> str:
+    async def verify_by_upload_async(self, db: AsyncSession, file_hash: str) -> str:
         """
         Checks if a file hash exists in the DB.
         """
-        record = db.query(Signature).filter(Signature.doc_hash == file_hash).first()
-        if record:
+        # Only the primary key is needed to answer "does it exist"
+        sig_id = await db.scalar(select(Signature.sig_id).where(Signature.doc_hash == file_hash).limit(1))
+        if sig_id:
             return "VALID"
         else:
             return "TAMPERED"
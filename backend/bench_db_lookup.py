@@ -0,0 +1,78 @@
+"""
+Benchmarks Signature lookups by doc_hash / signer_email with and without indexes.
+
+Usage: python bench_db_lookup.py [rows] [lookups]
+Builds a throwaway SQLite database (default 1,000,000 rows) using the same engine settings as the app.
+"""
+import os
+import sys
+import time
+import random
+import hashlib
+import tempfile
+from datetime import datetime
+
+db_path = os.path.join(tempfile.mkdtemp(prefix="bench_db_"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+from sqlalchemy import text
+from services.db_service import engine, SessionLocal, Base, Signature
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+LOOKUPS = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+BATCH = 50_000
+
+def doc_hash(i: int) -> str:
+    return hashlib.sha256(str(i).encode()).hexdigest()
+
+def populate():
+    Base.metadata.create_all(bind=engine)
+    # Start without the secondary indexes to measure the old behaviour
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_signatures_doc_hash"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_signatures_signer_email"))
+
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    for offset in range(0, ROWS, BATCH):
+        rows = [{
+            "sig_id": f"sig{i:09d}",
+            "doc_hash": doc_hash(i),
+            "signer_email": f"user{i % 5000}@example.com",
+            "signature": "x" * 344,  # Size of a base64 RSA-2048 signature
+            "timestamp": now,
+            "summary": None,
+            "created_at": now,
+        } for i in range(offset, min(offset + BATCH, ROWS))]
+        with engine.begin() as conn:
+            conn.execute(Signature.__table__.insert(), rows)
+    print(f"Inserted {ROWS:,} rows in {time.perf_counter() - start:.1f}s")
+
+def time_lookups(label: str):
+    db = SessionLocal()
+    try:
+        targets = [random.randrange(ROWS) for _ in range(LOOKUPS)]
+        start = time.perf_counter()
+        for i in targets:
+            db.query(Signature.sig_id).filter(Signature.doc_hash == doc_hash(i)).first()
+        by_hash = (time.perf_counter() - start) / LOOKUPS
+
+        start = time.perf_counter()
+        for i in targets:
+            db.query(Signature.sig_id).filter(Signature.signer_email == f"user{i % 5000}@example.com").limit(50).all()
+        by_email = (time.perf_counter() - start) / LOOKUPS
+    finally:
+        db.close()
+    print(f"{label:<16} doc_hash lookup: {by_hash * 1000:9.3f} ms   signer_email lookup: {by_email * 1000:9.3f} ms")
+
+if __name__ == "__main__":
+    populate()
+    time_lookups("No index")
+
+    start = time.perf_counter()
+    for index in Signature.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    print(f"Built indexes in {time.perf_counter() - start:.1f}s")
+    time_lookups("Indexed")
+
+    os.remove(db_path)
@@ -0,0 +1,68 @@
+"""
+Benchmarks the summariser engines (Sumy LSA vs NumPy TextRank, whole-text and chunked per page).
+
+Usage: python bench_summarizer.py [pages,...] [max_lsa_pages]
+Generates synthetic contract-like text (default 10, 50 and 200 pages of ~40 sentences).
+LSA is skipped above max_lsa_pages (default 50) since its cost grows superlinearly.
+Time and peak memory (tracemalloc, which includes NumPy buffers) are measured in separate runs.
+"""
+import sys
+import time
+import random
+import tracemalloc
+
+from agents.summary_agent import summary_agent
+
+PAGES = [int(p) for p in sys.argv[1].split(",")] if len(sys.argv) > 1 else [10, 50, 200]
+MAX_LSA_PAGES = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+SENTENCES_PER_PAGE = 40
+
+LEGAL_TERMS = ["agreement", "party", "parties", "obligation", "termination", "confidential", "liability", "indemnify",
+               "warranty", "payment", "services", "notice", "breach", "jurisdiction", "arbitration", "license",
+               "company", "contractor", "effective", "term", "damages", "property", "intellectual", "provision"]
+
+def make_document(pages: int, seed: int = 1) -> tuple[str, list[int]]:
+    rng = random.Random(seed)
+    # Zipf-ish vocabulary: a few legal terms dominate, plus a long tail of rarer words
+    vocabulary = LEGAL_TERMS + ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 10))) for _ in range(5000)]
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+
+    page_texts = []
+    for _ in range(pages):
+        sentences = []
+        for _ in range(SENTENCES_PER_PAGE):
+            words = rng.choices(vocabulary, weights=weights, k=rng.randint(8, 30))
+            sentences.append(" ".join(words).capitalize() + ".")
+        page_texts.append(" ".join(sentences))
+
+    page_offsets, offset = [], 0
+    for page_text in page_texts:
+        page_offsets.append(offset)
+        offset += len(page_text) + 1
+    return "\n".join(page_texts), page_offsets
+
+def measure(fn) -> tuple[float, float]:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+
+    # Tracing slows Python code down a lot, so memory gets its own run
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+if __name__ == "__main__":
+    print(f"{'pages':>6} {'engine':<18} {'time':>10} {'peak mem':>10}")
+    for pages in PAGES:
+        text, page_offsets = make_document(pages)
+        runs = {
+            "textrank": lambda: summary_agent.textrank(text),
+            "textrank-chunked": lambda: summary_agent.textrank(text, page_offsets),
+        }
+        if pages <= MAX_LSA_PAGES:
+            runs = {"lsa": lambda: summary_agent.lsa(text), **runs}
+        for engine, fn in runs.items():
+            elapsed, peak = measure(fn)
+            print(f"{pages:>6} {engine:<18} {elapsed * 1000:>8.0f}ms {peak:>8.1f}MB")
@@ -1,10 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from services.db_service import init_db
-from routes import upload, sign, verify, stamp, auth
+from fastapi.responses import JSONResponse, PlainTextResponse
+from routes import upload, sign, verify, stamp, auth, jobs
+from services.worker_pool import worker_pool
+from services.warmup_service import warmup_service
+from agents.ingestion_agent import ingestion_agent
+from agents.verification_agent import verification_agent
+from agents.audit_agent import audit_agent
+from services.auth_service import user_cache
+from services.metrics_service import metrics_service, MetricsMiddleware
+from services.upload_service import UploadLimitMiddleware
 
 app = FastAPI(title="Secure Document Signing System")
 
+# Oversized bodies get a 413 before the form is parsed (inside CORS, so browsers can read the error)
+app.add_middleware(UploadLimitMiddleware)
 # Enable CORS for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -13,17 +23,71 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so route latency includes CORS handling
+app.add_middleware(MetricsMiddleware, metrics=metrics_service)
 
-# Initialize DB
-init_db()
+# DB schema and signing keys are set up at start-up; heavy subsystems are then warmed up in the background
+@app.on_event("startup")
+async def startup():
+    await warmup_service.startup()
+
+@app.on_event("shutdown")
+def shutdown():
+    warmup_service.shutdown()
+    worker_pool.shutdown()
+    audit_agent.shutdown()
 
 # Include Routers
 app.include_router(upload.router)
 app.include_router(sign.router)
 app.include_router(verify.router)
 app.include_router(stamp.router)
+app.include_router(jobs.router)
 app.include_router(auth.router, tags=["Authentication"])
 
 @app.get("/")
 def root():
     return {"message": "Secure Document Signing API is running"}
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 until the warm-up has finished, with what's loaded so far."""
+    report = warmup_service.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "analysis": ingestion_agent.cache.stats(),
+        "verification": verification_agent.cache.stats(),
+        "users": user_cache.stats(),
+        "analysis_in_flight": ingestion_agent.flights.stats()
+    }
+
+@app.get("/audit/stats")
+def audit_stats():
+    return audit_agent.stats()
+
+def runtime_metrics():
+    """State kept by other components, read at scrape time: queues, in-flight work and cache counters."""
+    audit = audit_agent.stats()
+    flights = ingestion_agent.flights.stats()
+    metrics = [
+        ("eds_audit_queue_length", "gauge", "Audit events waiting to be written.", audit["queued"]),
+        ("eds_audit_dropped_total", "counter", "Audit events dropped because the queue was full.", audit["dropped"]),
+        ("eds_audit_written_total", "counter", "Audit events written.", audit["written"]),
+        ("eds_analysis_in_flight", "gauge", "Documents being analysed.", flights["in_flight"]),
+        ("eds_analysis_coalesced_total", "counter", "Uploads that joined an analysis already in flight.", flights["coalesced"]),
+    ]
+    for cache in (ingestion_agent.cache, verification_agent.cache, user_cache):
+        stats = cache.stats()
+        metrics.append((f"eds_cache_{stats['name']}_hits_total", "counter", f"Hits of the {stats['name']} cache.", stats["hits"]))
+        metrics.append((f"eds_cache_{stats['name']}_misses_total", "counter", f"Misses of the {stats['name']} cache.", stats["misses"]))
+    return metrics
+
+metrics_service.add_collector(runtime_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint (text exposition format 0.0.4)."""
+    return PlainTextResponse(metrics_service.render(), media_type="text/plain; version=0.0.4")
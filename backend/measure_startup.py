@@ -0,0 +1,76 @@
+"""
+Measures worker boot time: importing the app, time until uvicorn answers, and time until /ready reports ready.
+
+Usage: python measure_startup.py [runs] [port]
+Each run starts a fresh process against a throwaway SQLite database. Environment variables
+(WORKER_PROCESSES, WARMUP_SUBSYSTEMS, GEMINI_API_KEY...) are passed through, so configurations can be compared.
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+import statistics
+import urllib.error
+import urllib.request
+
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+PORT = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+TIMEOUT = 120
+
+def env_with_db() -> dict:
+    db_path = os.path.join(tempfile.mkdtemp(prefix="startup_"), "startup.db")
+    return {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}"}
+
+def time_import() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], env=env_with_db(), check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def get(path: str) -> tuple[int, dict | None]:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{PORT}{path}", timeout=2) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"null")
+
+def time_boot() -> tuple[float, float, dict | None]:
+    """Returns (seconds to first response, seconds to ready, final /ready report)."""
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT)],
+                              env=env_with_db(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    first_response = None
+    try:
+        while time.perf_counter() - start < TIMEOUT:
+            try:
+                status, report = get("/ready")
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                time.sleep(0.02)
+                continue
+            if first_response is None:
+                first_response = time.perf_counter() - start
+            if status == 200:
+                return first_response, time.perf_counter() - start, report
+            time.sleep(0.02)
+        raise TimeoutError("Server did not become ready")
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    imports, responses, readies = [], [], []
+    report = None
+    for run in range(RUNS):
+        imports.append(time_import())
+        first_response, ready, report = time_boot()
+        responses.append(first_response)
+        readies.append(ready)
+        print(f"run {run + 1}: import {imports[-1]:.2f}s  first response {first_response:.2f}s  ready {ready:.2f}s")
+
+    print(f"median: import {statistics.median(imports):.2f}s  first response {statistics.median(responses):.2f}s  ready {statistics.median(readies):.2f}s")
+    if report:
+        print("subsystems (last run):")
+        for name, status in report["subsystems"].items():
+            print(f"  {name:<12} loaded={status['loaded']!s:<5} {status.get('seconds', '-')}s {status.get('error') or ''}")
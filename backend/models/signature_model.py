@@ -12,13 +12,32 @@ class SignatureResponse(BaseModel):
     signature: str
     summary: str | None = None
 
+class SignatureBatchRequest(BaseModel):
+    items: list[SignatureCreate]
+    save: bool = False
+
+class SignatureBatchItem(BaseModel):
+    index: int
+    result: SignatureResponse | None = None
+    error: str | None = None
+
+class SignatureBatchResponse(BaseModel):
+    results: list[SignatureBatchItem]
+    signed: int
+    failed: int
+
 class VerificationResponse(BaseModel):
     valid: bool
+    sig_id: str | None = None
     signer_email: str | None = None
     timestamp: datetime | None = None
     doc_hash: str | None = None
     summary: str | None = None
 
+class VerificationBatchRequest(BaseModel):
+    sig_ids: list[str] = []
+    doc_hashes: list[str] = []
+
 class SuggestedPlace(BaseModel):
     page: int
     x: float
@@ -31,3 +50,26 @@ class DocumentHashResponse(BaseModel):
     is_signed: bool = False
     suggested_places: list[SuggestedPlace] = []
     legal_analysis: dict | None = None
+
+class DocumentAnalysisResponse(DocumentHashResponse):
+    engine: str
+    version: int
+    analyzed_at: datetime | None = None
+
+class JobEvent(BaseModel):
+    seq: int
+    stage: str
+    data: dict = {}
+    timestamp: datetime
+
+class UploadJobResponse(BaseModel):
+    job_id: str
+    doc_hash: str
+    status: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    events: list[JobEvent] = []
+    result: DocumentHashResponse | None = None
+    error: str | None = None
@@ -11,13 +11,26 @@ class UserLogin(BaseModel):
     email: EmailStr
     password: str
 
+class UserPrincipal(BaseModel):
+    """The authenticated user as seen by routes (no signature image blob)."""
+    id: int
+    full_name: str
+    email: EmailStr
+    is_company: bool
+    company_name: str | None = None
+    signature_image_id: str | None = None
+
+    class Config:
+        from_attributes = True
+
 class UserResponse(BaseModel):
     id: int
     full_name: str
     email: EmailStr
     is_company: bool
     company_name: str | None = None
-    signature_image: str | None = None
+    signature_image: str | None = None  # Data URL, kept for older clients
+    signature_image_id: str | None = None
 
     class Config:
         from_attributes = True
@@ -1,17 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
-from services.db_service import get_db, User
-from services.auth_service import auth_service, ALGORITHM, JWT_SECRET_KEY
-from models.user_model import UserCreate, UserResponse, Token
+from services.db_service import get_async_db, User
+from services.auth_service import auth_service, user_cache, HashingBusy, ALGORITHM, JWT_SECRET_KEY, PASSWORD_HASH_RETRY_AFTER
+from services.signature_image_service import signature_image_service, InvalidSignatureImage, to_data_url
+from models.user_model import UserCreate, UserResponse, UserPrincipal, Token
 from pydantic import BaseModel
 
 router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> UserPrincipal:
+    """
+    Resolves the bearer token to a UserPrincipal.
+    Principals are cached by token subject, so most calls cost a JWT decode plus a dict lookup.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -25,19 +32,42 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    principal = user_cache.get(email)
+    if principal is not None:
+        return principal
+
+    # signature_image is deferred, so this doesn't pull the image blob
+    user = await db.scalar(select(User).where(User.email == email))
     if user is None:
         raise credentials_exception
-    return user
+
+    principal = UserPrincipal.model_validate(user)
+    user_cache.set(email, principal)
+    return principal
+
+def invalidate_user(email: str):
+    """Call whenever a user record changes so the next request reloads it."""
+    user_cache.invalidate(email)
+
+def hashing_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many authentication requests, please retry shortly",
+        headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+    )
 
 @router.post("/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     print(f"Registering user: {user}")
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await db.scalar(select(User.id).where(User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = auth_service.get_password_hash(user.password)
+    try:
+        hashed_password = await auth_service.get_password_hash_async(user.password)
+    except HashingBusy:
+        raise hashing_busy_exception()
+
     new_user = User(
         full_name=user.full_name,
         email=user.email,
@@ -46,32 +76,72 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         company_name=user.company_name
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
+    await db.commit()
+    return UserResponse(**UserPrincipal.model_validate(new_user).model_dump())
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not auth_service.verify_password(form_data.password, user.password_hash):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect email or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Incorrect email or password",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    user = await db.scalar(select(User).where(User.email == form_data.username))
+    if not user:
+        raise credentials_exception
+
+    try:
+        valid, new_hash = await auth_service.verify_and_update_async(form_data.password, user.password_hash)
+    except HashingBusy:
+        raise hashing_busy_exception()
+    if not valid:
+        raise credentials_exception
+
+    if new_hash:
+        # Argon2 parameters changed since this hash was created; upgrade it transparently
+        user.password_hash = new_hash
+        await db.commit()
+        invalidate_user(user.email)
     
     access_token = auth_service.create_access_token(subject=user.email)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def read_users_me(current_user: UserPrincipal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    # The data URL is still returned for clients that don't use signature_image_id yet
+    if current_user.signature_image_id:
+        png = await signature_image_service.get(db, current_user.signature_image_id)
+        signature_image = to_data_url(png) if png is not None else None
+    else:
+        # Legacy row that predates the image store
+        signature_image = await db.scalar(select(User.signature_image).where(User.id == current_user.id))
+    return UserResponse(**current_user.model_dump(), signature_image=signature_image)
 
 class SignatureUpload(BaseModel):
     signature_image: str # Base64
 
 @router.post("/me/signature")
-def upload_signature(data: SignatureUpload, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    current_user.signature_image = data.signature_image
-    db.commit()
-    return {"message": "Signature updated successfully"}
+async def upload_signature(data: SignatureUpload, current_user: UserPrincipal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    try:
+        image_id = await signature_image_service.store(db, data.signature_image)
+    except InvalidSignatureImage as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # The normalised image lives in the store; clear the legacy base64 copy
+    await db.execute(update(User).where(User.id == current_user.id).values(signature_image_id=image_id, signature_image=None))
+    await db.commit()
+    invalidate_user(current_user.email)
+    return {"message": "Signature updated successfully", "signature_image_id": image_id}
+
+@router.get("/signature-images/{image_id}")
+async def get_signature_image(image_id: str, current_user: UserPrincipal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """The caller's own stored signature image; anyone else's is reported as not found."""
+    png = await signature_image_service.get(db, image_id) if image_id == current_user.signature_image_id else None
+    if png is None:
+        raise HTTPException(status_code=404, detail="Signature image not found")
+    # IDs are content hashes, so the response for an ID never changes
+    return Response(
+        content=png,
+        media_type="image/png",
+        headers={"Cache-Control": "private, max-age=31536000, immutable", "ETag": f'"{image_id}"'}
+    )
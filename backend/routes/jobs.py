@@ -0,0 +1,37 @@
+import json
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from services.job_service import job_service
+from models.signature_model import JobStatusResponse
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def get_job(job_id: str):
+    job = job_service.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, last_event_id: str | None = Header(default=None)):
+    """
+    Server-sent events, one per pipeline stage. Reconnecting clients resume after Last-Event-ID.
+    """
+    job = job_service.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    start = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+
+    async def event_stream():
+        async for event in job.subscribe(start):
+            payload = json.dumps(jsonable_encoder(event))
+            yield f"id: {event['seq']}\nevent: {event['stage']}\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,19 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from services.db_service import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.db_service import get_db, get_async_db
 from agents.signature_agent import signature_agent
 from agents.audit_agent import audit_agent
-from models.signature_model import SignatureCreate, SignatureResponse
+from models.signature_model import SignatureCreate, SignatureResponse, SignatureBatchRequest, SignatureBatchResponse
+import os
+
+SIGN_BATCH_MAX_ITEMS = int(os.getenv("SIGN_BATCH_MAX_ITEMS", "5000"))
 
 router = APIRouter()
 
 @router.post("/sign", response_model=SignatureResponse)
-def sign_document(request: SignatureCreate, db: Session = Depends(get_db)):
+async def sign_document(request: SignatureCreate, db: AsyncSession = Depends(get_async_db)):
     try:
         print(f"Received sign request for {request.signer_email} with summary: {request.summary}")
-        response = signature_agent.process(db, request.doc_hash, request.signer_email, request.summary, save=False)
-        audit_agent.log_action("SIGN", f"Signed hash {request.doc_hash} for {request.signer_email}")
+        response = await signature_agent.process_async(db, request.doc_hash, request.signer_email, request.summary, save=False)
+        audit_agent.log_action("SIGN", f"Signed hash {request.doc_hash} for {request.signer_email}",
+                               doc_hash=request.doc_hash, signer_email=request.signer_email, sig_id=response.sig_id)
         return response
     except Exception as e:
         audit_agent.log_action("SIGN_ERROR", str(e))
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/sign/batch", response_model=SignatureBatchResponse)
+def sign_batch(request: SignatureBatchRequest, db: Session = Depends(get_db)):
+    if len(request.items) > SIGN_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {SIGN_BATCH_MAX_ITEMS} items")
+    try:
+        results = signature_agent.process_batch(db, request.items, save=request.save)
+        failed = sum(1 for item in results if item.error)
+        audit_agent.log_action("SIGN_BATCH", f"Signed {len(results) - failed}/{len(results)} hashes, saved: {request.save}")
+        return SignatureBatchResponse(results=results, signed=len(results) - failed, failed=failed)
+    except Exception as e:
+        audit_agent.log_action("SIGN_BATCH_ERROR", str(e))
+        raise HTTPException(status_code=500, detail=str(e))
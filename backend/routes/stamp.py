@@ -1,8 +1,11 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
 from fastapi.responses import Response
-from sqlalchemy.orm import Session
-from services.pdf_service import pdf_service
-from services.db_service import get_db, Signature
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.worker_pool import worker_pool
+from services.upload_service import upload_service
+from services.db_service import get_async_db, Signature
+from services.signature_image_service import signature_image_service
+from services.metrics_service import metrics_service
 from agents.audit_agent import audit_agent
 import json
 from datetime import datetime
@@ -15,7 +18,7 @@ async def stamp_document(
     sig_id: str = Form(...),
     stamps: str = Form(...), # JSON string
     signature_data: str = Form(...), # JSON string
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         stamps_list = json.loads(stamps)
@@ -23,7 +26,7 @@ async def stamp_document(
         
         # Save Signature to DB
         # Check if already exists (idempotency)
-        existing_sig = db.query(Signature).filter(Signature.sig_id == sig_id).first()
+        existing_sig = await db.get(Signature, sig_id)
         if not existing_sig:
             new_sig = Signature(
                 sig_id=sig_data_dict['sig_id'],
@@ -34,20 +37,31 @@ async def stamp_document(
                 summary=sig_data_dict.get('summary')
             )
             db.add(new_sig)
-            db.commit()
-            audit_agent.log_action("SAVE_SIG", f"Saved signature {sig_id} to DB")
+            await db.commit()
+            audit_agent.log_action("SAVE_SIG", f"Saved signature {sig_id} to DB", sig_id=sig_id)
 
-        content = await file.read()
+        # Prefer a reference to the stored, normalised image; inline base64 is still accepted from older clients
         user_image = sig_data_dict.get('user_image')
-        stamped_pdf = pdf_service.stamp_pdf(content, sig_id, stamps_list, user_image)
+        user_image_id = sig_data_dict.get('user_image_id')
+        if user_image_id:
+            user_image = await signature_image_service.get(db, user_image_id)
+            if user_image is None:
+                raise HTTPException(status_code=400, detail="Unknown user_image_id")
+        # Imported here so pypdf / reportlab stay out of app start-up (the warm-up usually has them loaded already)
+        from services.pdf_service import stamp_pdf
+        with await upload_service.receive(file) as upload:
+            with metrics_service.stamp.time():
+                stamped_pdf = await worker_pool.run(stamp_pdf, upload.source(), sig_id, stamps_list, user_image)
         
-        audit_agent.log_action("STAMP", f"Stamped PDF with {sig_id} on {len(stamps_list)} locations")
+        audit_agent.log_action("STAMP", f"Stamped PDF with {sig_id} on {len(stamps_list)} locations", sig_id=sig_id)
         
         return Response(
             content=stamped_pdf,
             media_type="application/pdf",
             headers={"Content-Disposition": f"attachment; filename=signed_{file.filename}"}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         audit_agent.log_action("STAMP_ERROR", str(e))
         import traceback
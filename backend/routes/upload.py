@@ -1,40 +1,114 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from sqlalchemy.orm import Session
-from services.db_service import get_db, Signature
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.db_service import get_async_db, AsyncSessionLocal, Signature
+from services.upload_service import upload_service, SpooledUpload
+from services.job_service import job_service, Job
 from agents.ingestion_agent import ingestion_agent
 from agents.audit_agent import audit_agent
-from models.signature_model import DocumentHashResponse
+from services.analysis_store_service import analysis_store_service, load_result
+from services.metrics_service import metrics_service
+from models.signature_model import DocumentHashResponse, DocumentAnalysisResponse, UploadJobResponse
 
 router = APIRouter()
 
+async def check_signed(db: AsyncSession, doc_hash: str, detected_sig_id: str | None) -> bool:
+    # 1. Check exact hash match (original file re-upload)
+    existing_sig_by_hash = await db.scalar(select(Signature.sig_id).where(Signature.doc_hash == doc_hash).limit(1))
+    if existing_sig_by_hash:
+        return True
+
+    # 2. Check detected signature ID (signed file upload)
+    if detected_sig_id:
+        existing_sig_by_id = await db.scalar(select(Signature.sig_id).where(Signature.sig_id == detected_sig_id))
+        if existing_sig_by_id:
+            return True
+
+    return False
+
 @router.post("/upload-document", response_model=DocumentHashResponse)
-async def upload_document(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_document(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
     try:
-        content = await file.read()
-        doc_hash, summary, detected_sig_id, suggested_places, legal_analysis = ingestion_agent.process(content)
-        
-        is_signed = False
-        
-        # 1. Check exact hash match (original file re-upload)
-        existing_sig_by_hash = db.query(Signature).filter(Signature.doc_hash == doc_hash).first()
-        
-        if existing_sig_by_hash:
-            is_signed = True
-            
-        # 2. Check detected signature ID (signed file upload)
-        if not is_signed and detected_sig_id:
-            existing_sig_by_id = db.query(Signature).filter(Signature.sig_id == detected_sig_id).first()
-            if existing_sig_by_id:
-                is_signed = True
-        
-        audit_agent.log_action("UPLOAD", f"Processed file {file.filename}, hash: {doc_hash}, signed: {is_signed}")
+        # Receiving spools the upload and hashes it on the way in
+        with metrics_service.ingestion_stages.time(stage="receive_and_hash"):
+            upload = await upload_service.receive(file)
+        # The analysis closes the upload when it is done with it, which may be after this request was cancelled
+        doc_hash, summary, detected_sig_id, suggested_places, legal_analysis = await ingestion_agent.process_async(
+            upload.source(), upload.doc_hash, release=upload.close
+        )
+
+        is_signed = await check_signed(db, doc_hash, detected_sig_id)
+
+        audit_agent.log_action("UPLOAD", f"Processed file {file.filename}, hash: {doc_hash}, signed: {is_signed}", doc_hash=doc_hash, signed=is_signed)
         return DocumentHashResponse(
-            doc_hash=doc_hash, 
-            summary=summary, 
+            doc_hash=doc_hash,
+            summary=summary,
             is_signed=is_signed,
             suggested_places=suggested_places,
             legal_analysis=legal_analysis
         )
+    except HTTPException:
+        raise
     except Exception as e:
         audit_agent.log_action("UPLOAD_ERROR", str(e))
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analysis/{doc_hash}", response_model=DocumentAnalysisResponse)
+async def get_analysis(doc_hash: str, db: AsyncSession = Depends(get_async_db)):
+    """Stored analysis of a previously uploaded document, so clients don't have to upload it again."""
+    stored = await analysis_store_service.get(db, doc_hash)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="No analysis stored for this document")
+
+    summary, detected_sig_id, suggested_places, legal_analysis = load_result(stored)
+    is_signed = await check_signed(db, doc_hash, detected_sig_id)
+    return DocumentAnalysisResponse(
+        doc_hash=doc_hash,
+        summary=summary,
+        is_signed=is_signed,
+        suggested_places=suggested_places,
+        legal_analysis=legal_analysis,
+        engine=stored.engine,
+        version=stored.version,
+        analyzed_at=stored.created_at
+    )
+
+async def run_upload_job(job: Job, upload: SpooledUpload) -> dict:
+    """Background part of a job-mode upload; the final result is the usual DocumentHashResponse."""
+    try:
+        doc_hash, summary, detected_sig_id, suggested_places, legal_analysis = await ingestion_agent.process_async(
+            upload.source(), upload.doc_hash, on_event=job.publish, release=upload.close
+        )
+
+        # The request-scoped session is gone by now; use a dedicated one
+        async with AsyncSessionLocal() as db:
+            is_signed = await check_signed(db, doc_hash, detected_sig_id)
+
+        audit_agent.log_action("UPLOAD", f"Processed file {upload.filename} (job {job.job_id}), hash: {doc_hash}, signed: {is_signed}",
+                               doc_hash=doc_hash, signed=is_signed, job_id=job.job_id)
+        return DocumentHashResponse(
+            doc_hash=doc_hash,
+            summary=summary,
+            is_signed=is_signed,
+            suggested_places=suggested_places,
+            legal_analysis=legal_analysis
+        ).model_dump(mode="json")
+    except Exception as e:
+        audit_agent.log_action("UPLOAD_ERROR", f"Job {job.job_id}: {e}")
+        raise
+
+@router.post("/upload-document/jobs", response_model=UploadJobResponse, status_code=202)
+async def create_upload_job(file: UploadFile = File(...)):
+    """
+    Job mode: returns 202 as soon as the document is received and hashed.
+    Progress is available from GET /jobs/{job_id} or the SSE stream at /jobs/{job_id}/events.
+    """
+    with metrics_service.ingestion_stages.time(stage="receive_and_hash"):
+        upload = await upload_service.receive(file)
+    job = job_service.create(file.filename)
+    job.publish("hashed", {"doc_hash": upload.doc_hash, "size": upload.size})
+    job_service.submit(job, run_upload_job(job, upload))
+
+    audit_agent.log_action("UPLOAD_JOB", f"Queued file {file.filename} as job {job.job_id}, hash: {upload.doc_hash}",
+                           doc_hash=upload.doc_hash, job_id=job.job_id)
+    return UploadJobResponse(job_id=job.job_id, doc_hash=upload.doc_hash, status=job.status)
@@ -1,33 +1,62 @@
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
-from sqlalchemy.orm import Session
-from services.db_service import get_db
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.db_service import get_async_db, SessionLocal
+from services.upload_service import upload_service
 from agents.verification_agent import verification_agent
-from agents.ingestion_agent import ingestion_agent
 from agents.audit_agent import audit_agent
-from models.signature_model import VerificationResponse
+from models.signature_model import VerificationResponse, VerificationBatchRequest
+import os
+
+VERIFY_BATCH_MAX_ITEMS = int(os.getenv("VERIFY_BATCH_MAX_ITEMS", "5000"))  # sig_ids + doc_hashes
 
 router = APIRouter()
 
 @router.get("/verify/{sig_id}", response_model=VerificationResponse)
-def verify_signature(sig_id: str, db: Session = Depends(get_db)):
+async def verify_signature(sig_id: str, db: AsyncSession = Depends(get_async_db)):
     try:
-        response = verification_agent.verify_by_id(db, sig_id)
-        audit_agent.log_action("VERIFY_ID", f"Verified ID {sig_id}, Valid: {response.valid}")
+        response = await verification_agent.verify_by_id_async(db, sig_id)
+        audit_agent.log_action("VERIFY_ID", f"Verified ID {sig_id}, Valid: {response.valid}", sig_id=sig_id, valid=response.valid)
         return response
     except Exception as e:
         audit_agent.log_action("VERIFY_ID_ERROR", str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/verify/batch")
+def verify_batch(request: VerificationBatchRequest):
+    """
+    Streams one VerificationResponse per line (NDJSON) so memory stays flat while answering.
+    """
+    if len(request.sig_ids) + len(request.doc_hashes) > VERIFY_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {VERIFY_BATCH_MAX_ITEMS} items")
+    audit_agent.log_action("VERIFY_BATCH", f"Verifying {len(request.sig_ids)} sig_ids and {len(request.doc_hashes)} doc hashes")
+
+    def stream_results():
+        # Own session: the response body is produced after the request-scoped dependencies exit
+        db = SessionLocal()
+        try:
+            for response in verification_agent.verify_batch(db, request.sig_ids, request.doc_hashes):
+                yield response.model_dump_json() + "\n"
+        except Exception as e:
+            audit_agent.log_action("VERIFY_BATCH_ERROR", str(e))
+            raise
+        finally:
+            db.close()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 @router.post("/verify-upload")
-async def verify_upload(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def verify_upload(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
     try:
-        content = await file.read()
-        # Unpack the tuple (hash, summary, detected_sig_id, suggested_places, legal_analysis)
-        doc_hash, _, _, _, _ = ingestion_agent.process(content)
-        
-        result = verification_agent.verify_by_upload(db, doc_hash)
-        audit_agent.log_action("VERIFY_UPLOAD", f"Verified upload, Result: {result}")
+        # Hash-only fast path: stream and hash the bytes without keeping them,
+        # no PDF parsing, summarisation or Gemini call
+        upload = await upload_service.receive(file, keep_content=False)
+        doc_hash = upload.doc_hash
+        result = await verification_agent.verify_by_upload_async(db, doc_hash)
+        audit_agent.log_action("VERIFY_UPLOAD", f"Verified upload {doc_hash}, Result: {result}", doc_hash=doc_hash)
         return {"status": result}
+    except HTTPException:
+        raise
     except Exception as e:
         audit_agent.log_action("VERIFY_UPLOAD_ERROR", str(e))
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,43 @@
+import json
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.db_service import DocumentAnalysis
+
+RESULT_FIELDS = ("summary", "detected_sig_id", "suggested_places", "legal_analysis")
+
+def dump_result(result: tuple) -> str:
+    """(summary, detected_sig_id, suggested_places, legal_analysis) as compact JSON."""
+    return json.dumps(dict(zip(RESULT_FIELDS, result)), separators=(",", ":"), ensure_ascii=False, default=str)
+
+def load_result(row: DocumentAnalysis) -> tuple:
+    data = json.loads(row.result)
+    return tuple(data.get(name) for name in RESULT_FIELDS)
+
+class AnalysisStoreService:
+    """
+    Persistent ingestion results in the document_analyses table, keyed by doc_hash.
+    Rows carry the engine / version that produced them; get() only returns rows matching the ones asked for,
+    so changing the pipeline recomputes (and overwrites) older analyses.
+    """
+    async def get(self, db: AsyncSession, doc_hash: str, engine: str | None = None, version: int | None = None) -> DocumentAnalysis | None:
+        row = await db.get(DocumentAnalysis, doc_hash)
+        return row if self._matches(row, engine, version) else None
+
+    async def save(self, db: AsyncSession, doc_hash: str, engine: str, version: int, result: tuple):
+        """Inserts or replaces the analysis and commits; a concurrent insert from another worker wins."""
+        await db.merge(DocumentAnalysis(doc_hash=doc_hash, engine=engine, version=version, result=dump_result(result), created_at=datetime.utcnow()))
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+
+    @staticmethod
+    def _matches(row: DocumentAnalysis | None, engine: str | None, version: int | None) -> bool:
+        if row is None:
+            return False
+        if engine is not None and row.engine != engine:
+            return False
+        return version is None or row.version == version
+
+analysis_store_service = AnalysisStoreService()
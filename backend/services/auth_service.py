@@ -1,22 +1,83 @@
 import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Union, Any
 from jose import jwt
 from passlib.context import CryptContext
+from services.cache_service import LRUCache
 
 ACCESS_TOKEN_EXPIRE_MINUTES = 30  # 30 minutes
 ALGORITHM = "HS256"
 JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', "a_very_secret_key_for_dev_only") # Should be in env
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# Argon2 cost parameters. Changing them upgrades existing hashes transparently on next login.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+
+# Dedicated hashing threads, so a login burst can't starve FastAPI's shared threadpool.
+# Requests beyond workers + queue depth are rejected immediately instead of piling up.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv("PASSWORD_HASH_QUEUE_DEPTH", "16"))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "2"))  # Seconds, sent as Retry-After
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+    argon2__parallelism=ARGON2_PARALLELISM
+)
+
+# Authenticated principals keyed by token subject (email); short TTL bounds staleness across workers
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+user_cache = LRUCache("users", max_entries=USER_CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL_SECONDS)
+
+class HashingBusy(Exception):
+    """Raised when the password hashing queue is full."""
 
 class AuthService:
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+
     def verify_password(self, plain_password, hashed_password):
         return pwd_context.verify(plain_password, hashed_password)
 
     def get_password_hash(self, password):
         return pwd_context.hash(password)
 
+    async def verify_and_update_async(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """
+        Verifies on the hashing executor. Returns (valid, new_hash); new_hash is set when the stored
+        hash used outdated Argon2 parameters and should be saved.
+        Raises HashingBusy when the queue is full.
+        """
+        return await self._run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+    async def get_password_hash_async(self, password: str) -> str:
+        """Hashes on the hashing executor. Raises HashingBusy when the queue is full."""
+        return await self._run(pwd_context.hash, password)
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_DEPTH:
+                self.rejected += 1
+                raise HashingBusy()
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+
     def create_access_token(self, subject: Union[str, Any], expires_delta: int = None) -> str:
         if expires_delta is not None:
             expires_delta = datetime.utcnow() + expires_delta
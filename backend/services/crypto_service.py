@@ -1,18 +1,35 @@
 import os
 import base64
 import hashlib
+import threading
 import base58
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.backends import default_backend
+from concurrent.futures import ThreadPoolExecutor
+from services.metrics_service import metrics_service
+
+# RSA operations in `cryptography` release the GIL, so threads scale across cores
+CRYPTO_THREADS = int(os.getenv("CRYPTO_THREADS", str(os.cpu_count() or 1)))
 
 class CryptoService:
     def __init__(self):
         self.private_key = None
         self.public_key = None
-        self.load_keys()
+        # Threads are only started on first use
+        self.executor = ThreadPoolExecutor(max_workers=CRYPTO_THREADS, thread_name_prefix="crypto")
+        # Keys are loaded by the app's start-up hook, or on first use elsewhere
+        self._keys_attempted = False
+        self._keys_lock = threading.Lock()
+
+    def ensure_keys(self):
+        if not self._keys_attempted:
+            with self._keys_lock:
+                if not self._keys_attempted:
+                    self.load_keys()
 
     def load_keys(self):
+        self._keys_attempted = True
         # Try loading from env var first, then file
         private_key_pem = os.getenv("PRIVATE_KEY")
         if not private_key_pem:
@@ -34,27 +51,12 @@ class CryptoService:
         self.public_key = self.private_key.public_key()
 
     def sign_payload(self, payload: str) -> str:
+        self.ensure_keys()
         if not self.private_key:
             raise Exception("Private key not loaded")
         
-        signature = self.private_key.sign(
-            payload.encode(),
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH,
-            ),
-            hashes.SHA256()
-        )
-        return base64.b64encode(signature).decode()
-
-    def verify_signature(self, payload: str, signature_b64: str) -> bool:
-        if not self.public_key:
-            raise Exception("Public key not loaded")
-            
-        try:
-            signature = base64.b64decode(signature_b64)
-            self.public_key.verify(
-                signature,
+        with metrics_service.crypto.time(operation="sign"):
+            signature = self.private_key.sign(
                 payload.encode(),
                 padding.PSS(
                     mgf=padding.MGF1(hashes.SHA256()),
@@ -62,10 +64,50 @@ class CryptoService:
                 ),
                 hashes.SHA256()
             )
-            return True
-        except Exception as e:
-            print(f"Verification failed: {e}")
-            return False
+        return base64.b64encode(signature).decode()
+
+    def verify_signature(self, payload: str, signature_b64: str) -> bool:
+        self.ensure_keys()
+        if not self.public_key:
+            raise Exception("Public key not loaded")
+            
+        with metrics_service.crypto.time(operation="verify") as timer:
+            try:
+                signature = base64.b64decode(signature_b64)
+                self.public_key.verify(
+                    signature,
+                    payload.encode(),
+                    padding.PSS(
+                        mgf=padding.MGF1(hashes.SHA256()),
+                        salt_length=padding.PSS.MAX_LENGTH,
+                    ),
+                    hashes.SHA256()
+                )
+                return True
+            except Exception as e:
+                timer.outcome = "invalid"
+                print(f"Verification failed: {e}")
+                return False
+
+    def sign_many(self, payloads: list[str]) -> list[str | Exception]:
+        """
+        Signs payloads in parallel on the crypto thread pool.
+        Returns one entry per payload, in order: the base64 signature or the exception raised.
+        """
+        futures = [self.executor.submit(self.sign_payload, payload) for payload in payloads]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def verify_many(self, items: list[tuple[str, str]]) -> list[bool]:
+        """
+        Verifies (payload, signature_b64) pairs in parallel on the crypto thread pool, preserving order.
+        """
+        return list(self.executor.map(lambda item: self.verify_signature(*item), items))
 
     def generate_sig_id(self, signature_b64: str) -> str:
         signature = base64.b64decode(signature_b64)
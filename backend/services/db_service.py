@@ -1,14 +1,92 @@
 import os
-from sqlalchemy import create_engine, Column, String, Text, DateTime, Integer, Boolean
+from urllib.parse import parse_qsl, urlencode
+from sqlalchemy import create_engine, event, inspect, text, Column, String, Text, DateTime, Integer, Boolean, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import sessionmaker, deferred
 from datetime import datetime
+from services.metrics_service import metrics_service
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
 
-engine = create_engine(DATABASE_URL)
+# Connection pools (server databases such as Postgres). Each worker process opens up to
+# DB_POOL_SIZE + DB_MAX_OVERFLOW connections for the async engine, which serves the request path, plus
+# DB_SYNC_POOL_SIZE + DB_SYNC_MAX_OVERFLOW for the sync engine, which only handles startup, migrations
+# and the batch sign/verify endpoints
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_SYNC_POOL_SIZE = int(os.getenv("DB_SYNC_POOL_SIZE", "2"))
+DB_SYNC_MAX_OVERFLOW = int(os.getenv("DB_SYNC_MAX_OVERFLOW", "3"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# SQLite pragmas: WAL lets readers proceed during writes, NORMAL sync is safe with WAL,
+# busy_timeout makes concurrent writers wait instead of failing with "database is locked"
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def engine_options(url: str, pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW) -> dict:
+    if is_sqlite(url):
+        return {"connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+# Async drivers used for the asyncio engine when ASYNC_DATABASE_URL isn't set explicitly
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+# libpq-only query parameters (e.g. in Neon URLs) that asyncpg rejects; sslmode is translated to asyncpg's ssl instead
+ASYNCPG_DROPPED_PARAMS = ("channel_binding", "target_session_attrs", "gssencmode")
+
+def to_async_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    async_scheme = ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)
+    if async_scheme.endswith("+asyncpg") and "?" in rest:
+        rest, query = rest.split("?", 1)
+        params = []
+        for key, value in parse_qsl(query, keep_blank_values=True):
+            if key == "sslmode":
+                params.append(("ssl", value))
+            elif key not in ASYNCPG_DROPPED_PARAMS:
+                params.append((key, value))
+        rest = f"{rest}?{urlencode(params)}" if params else rest
+    return f"{async_scheme}://{rest}"
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, DB_SYNC_POOL_SIZE, DB_SYNC_MAX_OVERFLOW))
+if is_sqlite(DATABASE_URL):
+    event.listen(engine, "connect", set_sqlite_pragmas)
+metrics_service.instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Same database through the SQLAlchemy asyncio extension, for async routes
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+if is_sqlite(ASYNC_DATABASE_URL):
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+metrics_service.instrument_engine(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 class User(Base):
@@ -20,22 +98,62 @@ class User(Base):
     password_hash = Column(String, nullable=False)
     is_company = Column(Boolean, default=False)
     company_name = Column(String, nullable=True)
-    signature_image = Column(Text, nullable=True)  # Base64 encoded image
+    signature_image = deferred(Column(Text, nullable=True))  # Legacy base64 image, superseded by signature_image_id
+    signature_image_id = Column(String, nullable=True)  # SignatureImage.id
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class Signature(Base):
     __tablename__ = "signatures"
 
     sig_id = Column(String, primary_key=True, index=True)
-    doc_hash = Column(String, nullable=False)
-    signer_email = Column(String, nullable=False)
+    doc_hash = Column(String, nullable=False, index=True)
+    signer_email = Column(String, nullable=False, index=True)
     signature = Column(Text, nullable=False)
     timestamp = Column(DateTime, nullable=False)
     summary = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class SignatureImage(Base):
+    """Normalised signature images, keyed by the SHA-256 of the PNG so identical images are stored once."""
+    __tablename__ = "signature_images"
+
+    id = Column(String, primary_key=True)
+    png = deferred(Column(LargeBinary, nullable=False))
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class DocumentAnalysis(Base):
+    """Ingestion results by document hash, so they survive restarts and are shared by every worker."""
+    __tablename__ = "document_analyses"
+
+    doc_hash = Column(String, primary_key=True)
+    engine = Column(String, nullable=False)  # Pipeline that produced it, e.g. "gemini/chunked" or "local/auto"
+    version = Column(Integer, nullable=False)  # Bumped when the analysis output changes; older rows are recomputed
+    result = Column(Text, nullable=False)  # Compact JSON: summary, detected_sig_id, suggested_places, legal_analysis
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    migrate_db()
+
+def migrate_db():
+    """
+    Brings databases created by older versions up to date.
+    create_all() only creates missing tables, so nullable columns and indexes added later are created here (no-op if present).
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=engine.dialect)
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                print(f"Added column {table.name}.{column.name}")
+
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 def get_db():
     db = SessionLocal()
@@ -43,3 +161,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,104 @@
+import os
+import time
+import uuid
+import asyncio
+from datetime import datetime
+
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "900"))  # Finished jobs are kept this long for polling
+
+class Job:
+    """
+    A background job with an append-only list of progress events.
+    Subscribers wait on an asyncio.Event that is swapped every time something is published.
+    """
+    def __init__(self, job_id: str, filename: str | None = None):
+        self.job_id = job_id
+        self.filename = filename
+        self.status = "pending"  # pending / running / completed / failed
+        self.events = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def publish(self, stage: str, data: dict | None = None):
+        self.events.append({
+            "seq": len(self.events),
+            "stage": stage,
+            "data": data or {},
+            "timestamp": datetime.utcnow()
+        })
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self, start: int = 0):
+        """Yields events from index start onwards, waiting for new ones until the job is done."""
+        index = start
+        while True:
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.done:
+                return
+            await self._changed.wait()
+
+    def snapshot(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "events": self.events,
+            "result": self.result,
+            "error": self.error
+        }
+
+class JobService:
+    """
+    In-memory job registry. Jobs live in the uvicorn worker that accepted the upload,
+    so polling must reach the same worker (sticky sessions) when running several.
+    """
+    def __init__(self):
+        self.jobs = {}
+        self._tasks = set()
+
+    def create(self, filename: str | None = None) -> Job:
+        self._expire()
+        job = Job(uuid.uuid4().hex, filename)
+        self.jobs[job.job_id] = job
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def submit(self, job: Job, coro):
+        """Runs coro in the background; its return value becomes the job result."""
+        task = asyncio.create_task(self._run(job, coro))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: Job, coro):
+        job.status = "running"
+        try:
+            job.result = await coro
+            job.status = "completed"
+            job.finished_at = time.time()
+            job.publish("completed", {"result": job.result})
+        except Exception as e:
+            print(f"Job {job.job_id} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+            job.finished_at = time.time()
+            job.publish("failed", {"error": job.error})
+
+    def _expire(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self.jobs.items() if job.done and now - job.finished_at > JOB_TTL_SECONDS]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+job_service = JobService()
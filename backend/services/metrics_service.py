@@ -0,0 +1,219 @@
+import os
+import time
+import asyncio
+import threading
+from bisect import bisect_left
+
+# Recording costs two clock reads and a short lock per observation; rendering only happens on scrape
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(kb * 1024 for kb in (16, 64, 256, 1024, 4096, 16384, 65536, 262144))
+PAGE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+INF_LABEL = 'le="+Inf"'
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}")
+        return lines
+
+class Timer:
+    """Context manager observing its duration into a histogram; set .outcome to label how it ended."""
+    __slots__ = ("histogram", "labels", "outcome", "start")
+
+    def __init__(self, histogram: "Histogram", labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+        self.outcome = "ok"
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.outcome = "cancelled" if issubclass(exc_type, asyncio.CancelledError) else "error"
+        self.histogram.observe(time.perf_counter() - self.start, outcome=self.outcome, **self.labels)
+        return False
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus sense. Timers add an "outcome" label (ok / error, or
+    whatever the code sets), so counts per outcome give error rates.
+    """
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, **labels) -> Timer:
+        return Timer(self, labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="' + format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, INF_LABEL)} {series[-1]}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {format_value(series[-2])}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+class MetricsService:
+    """
+    In-process metrics registry, rendered in the Prometheus text format at /metrics.
+    Each uvicorn worker keeps its own numbers (scrape them per worker, or aggregate by instance).
+    Work done in the worker pool is timed from the serving process, so it includes the hand-off.
+    Values owned by other components are read from collectors, callables returning
+    (name, "gauge" / "counter", help, value) tuples, only when scraped.
+    """
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+        self.http_requests = self.histogram("eds_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+        self.ingestion_stages = self.histogram("eds_ingestion_stage_duration_seconds", "Document ingestion latency by stage.", ("stage", "outcome"))
+        self.stamp = self.histogram("eds_stamp_pdf_duration_seconds", "PDF stamping latency.", ("outcome",))
+        self.crypto = self.histogram("eds_crypto_duration_seconds", "Signing / verification latency.", ("operation", "outcome"))
+        self.db_queries = self.histogram("eds_db_query_duration_seconds", "Database statement latency.", ("statement",))
+        self.db_errors = self.counter("eds_db_query_errors_total", "Database statements that raised.", ("statement",))
+        self.document_bytes = self.histogram("eds_document_size_bytes", "Size of analysed documents.", buckets=SIZE_BUCKETS)
+        self.document_pages = self.histogram("eds_document_pages", "Page count of analysed documents.", buckets=PAGE_BUCKETS)
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            for name, kind, help, value in collector():
+                lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {format_value(value)}"])
+        return "\n".join(lines) + "\n"
+
+    def instrument_engine(self, engine):
+        """Times every statement run on a (sync) SQLAlchemy engine; use async_engine.sync_engine for async ones."""
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            start = conn.info["query_start"].pop()
+            self.db_queries.observe(time.perf_counter() - start, statement=statement_kind(statement))
+
+        @event.listens_for(engine, "handle_error")
+        def handle_error(context):
+            starts = context.connection.info.get("query_start") if context.connection is not None else None
+            if starts:
+                starts.pop()
+            self.db_errors.inc(statement=statement_kind(context.statement or ""))
+
+STATEMENT_KINDS = ("select", "insert", "update", "delete", "pragma", "create", "alter")
+
+def statement_kind(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    return keyword if keyword in STATEMENT_KINDS else "other"
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request until its response has been sent, labelled by the route template
+    (e.g. /verify/{sig_id}) so path parameters don't explode the label set. Unmatched paths count as "unmatched".
+    """
+    def __init__(self, app, metrics: MetricsService):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            self.metrics.http_requests.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status
+            )
+
+metrics_service = MetricsService()
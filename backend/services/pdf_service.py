@@ -1,18 +1,150 @@
 import io
+import os
+import re
 import base64
+import shutil
+from typing import BinaryIO
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, IndirectObject, NameObject, NumberObject
+from services.upload_service import open_source
+
+# "incremental" appends the stamps as an incremental update to the original file (falls back to "rewrite" on error);
+# "rewrite" re-serialises the whole document
+PDF_STAMP_MODE = os.getenv("PDF_STAMP_MODE", "incremental").lower()
+
+COPY_CHUNK_SIZE = 1024 * 1024  # Original bytes are copied into the incremental update in 1 MB chunks
+
+DIGITAL_STAMP_FORM = "DigitalStamp"
+DIGITAL_STAMP_WIDTH = 150
+DIGITAL_STAMP_HEIGHT = 30
 
 class PDFService:
-    def stamp_pdf(self, file_content: bytes, sig_id: str, stamps: list[dict], user_image: str | None = None) -> bytes:
+    def stamp_pdf(self, file_content: bytes | str | BinaryIO, sig_id: str, stamps: list[dict], user_image: str | bytes | None = None) -> bytes:
         """
         Stamps the signature ID or user image onto the PDF at the given coordinates.
         stamps: list of dicts with keys 'page', 'x', 'y', 'type' ('digital' or 'user')
+        file_content may be raw bytes, a file path or a binary file object, which is read in place.
+        user_image is either PNG bytes from the signature image store or a legacy base64 / data URL string.
         """
-        existing_pdf = PdfReader(io.BytesIO(file_content))
+        with open_source(file_content) as stream:
+            return self._stamp_stream(stream, sig_id, stamps, self._load_image(user_image))
+
+    @staticmethod
+    def _load_image(user_image: str | bytes | None) -> ImageReader | None:
+        """Decodes the user image once per document rather than once per placement."""
+        if not user_image:
+            return None
+        try:
+            if isinstance(user_image, str):
+                img_str = user_image
+                if "base64," in img_str:
+                    img_str = img_str.split("base64,")[1]
+                user_image = base64.b64decode(img_str)
+            return ImageReader(io.BytesIO(user_image))
+        except Exception as e:
+            print(f"Failed to load user image: {e}")
+            return None
+
+    def _stamp_stream(self, stream: BinaryIO, sig_id: str, stamps: list[dict], img: ImageReader | None) -> bytes:
+        if PDF_STAMP_MODE == "incremental":
+            try:
+                return self._stamp_incremental(stream, sig_id, stamps, img)
+            except Exception as e:
+                # e.g. encrypted or damaged files pypdf can't update in place; a full rewrite still works
+                print(f"Incremental stamping failed, rewriting document: {e}")
+                stream.seek(0)
+        return self._stamp_rewrite(stream, sig_id, stamps, img)
+
+    def _stamp_incremental(self, stream: BinaryIO, sig_id: str, stamps: list[dict], img: ImageReader | None) -> bytes:
+        """
+        Appends an incremental update: the original bytes are copied through untouched, followed by
+        the overlay objects, the modified page dictionaries and a new xref section.
+        Only the page tree and the stamped pages are parsed, so cost scales with the number of
+        stamped pages rather than document size, and the output still starts with the original file.
+        """
+        existing_pdf = PdfReader(stream)
+        update = IncrementalUpdate(existing_pdf, stream)
+        stamps_by_page = self._group_stamps(stamps)
+
+        stamped_pages = sorted(p for p in stamps_by_page if 1 <= p <= len(existing_pdf.pages))
+        overlays = self._render_overlays(existing_pdf.pages, stamped_pages, stamps_by_page, sig_id, img)
+
+        # Original content is wrapped in q ... Q so its graphics state can't leak into the overlay
+        save_state = update.add(self._content_stream(b"q\n"))
+        for page_num, overlay in overlays.items():
+            page = existing_pdf.pages[page_num - 1]
+
+            # The overlay page becomes a form XObject drawn on top of the page, so its resource
+            # names can never clash with the page's own
+            form = self._content_stream(overlay.get_contents().get_data()).flate_encode()
+            form.update({
+                NameObject("/Type"): NameObject("/XObject"),
+                NameObject("/Subtype"): NameObject("/Form"),
+                NameObject("/BBox"): ArrayObject(overlay.mediabox),
+                NameObject("/Resources"): update.import_object(overlay.raw_get("/Resources")),
+            })
+            form_ref = update.add(form)
+
+            resources = self._copy_dict(page.get("/Resources"))
+            xobjects = self._copy_dict(resources.get("/XObject"))
+            name = "/EdsStamp"
+            while name in xobjects:
+                name += "_"
+            xobjects[NameObject(name)] = form_ref
+            resources[NameObject("/XObject")] = xobjects
+
+            contents = page.raw_get("/Contents") if "/Contents" in page else ArrayObject()
+            if isinstance(contents.get_object(), ArrayObject):
+                contents = list(contents.get_object())
+            else:
+                contents = [contents]
+            draw_overlay = update.add(self._content_stream(f"Q\nq {name} Do Q\n".encode()))
+
+            new_page = self._copy_dict(page)
+            new_page[NameObject("/Contents")] = ArrayObject([save_state, *contents, draw_overlay])
+            new_page[NameObject("/Resources")] = resources
+            update.replace(page.indirect_reference, new_page)
+
+        return update.write()
+
+    @staticmethod
+    def _content_stream(data: bytes) -> DecodedStreamObject:
+        stream = DecodedStreamObject()
+        stream.set_data(data)
+        return stream
+
+    @staticmethod
+    def _copy_dict(obj) -> DictionaryObject:
+        """Shallow copy of a (possibly indirect) dictionary that keeps the references inside it as references."""
+        obj = obj.get_object() if obj is not None else None
+        return DictionaryObject(dict.items(obj)) if obj is not None else DictionaryObject()
+
+    def _stamp_rewrite(self, stream: BinaryIO, sig_id: str, stamps: list[dict], img: ImageReader | None) -> bytes:
+        existing_pdf = PdfReader(stream)
         output = PdfWriter()
-        
+        stamps_by_page = self._group_stamps(stamps)
+
+        page_count = len(existing_pdf.pages)
+        stamped_pages = sorted(p for p in stamps_by_page if 1 <= p <= page_count)
+        overlays = self._render_overlays(existing_pdf.pages, stamped_pages, stamps_by_page, sig_id, img)
+
+        # Loop through all pages
+        for i in range(page_count):
+            page = existing_pdf.pages[i]
+            page_num = i + 1
+            if page_num in overlays:
+                page.merge_page(overlays[page_num])
+            output.add_page(page)
+            
+        # Write the output
+        output_stream = io.BytesIO()
+        output.write(output_stream)
+        return output_stream.getvalue()
+
+    @staticmethod
+    def _group_stamps(stamps: list[dict]) -> dict:
         # Group stamps by page
         stamps_by_page = {}
         for stamp in stamps:
@@ -20,68 +152,224 @@ class PDFService:
             if p not in stamps_by_page:
                 stamps_by_page[p] = []
             stamps_by_page[p].append(stamp)
+        return stamps_by_page
 
-        # Loop through all pages
-        for i in range(len(existing_pdf.pages)):
-            page = existing_pdf.pages[i]
-            page_num = i + 1
-            
-            if page_num in stamps_by_page:
-                # Get page dimensions
-                page_width = float(page.mediabox.width)
-                page_height = float(page.mediabox.height)
-                
-                # Create a new PDF with Reportlab for this page's stamps
-                packet = io.BytesIO()
-                c = canvas.Canvas(packet, pagesize=(page_width, page_height))
+    def _render_overlays(self, pages, stamped_pages: list[int], stamps_by_page: dict, sig_id: str, img: ImageReader | None) -> dict:
+        """
+        Draws every stamped page's overlay into a single reportlab document, one overlay page per stamped page.
+        The user image and the digital stamp are each embedded once (image XObject / form XObject)
+        and referenced from every placement, so output size stays nearly flat as placements grow.
+        Returns {page_num: overlay page}.
+        """
+        if not stamped_pages:
+            return {}
+
+        packet = io.BytesIO()
+        c = canvas.Canvas(packet)
+        self._define_digital_stamp(c, sig_id)
+
+        if img:
+            # Calculate dimensions (max width 150)
+            iw, ih = img.getSize()
+            image_width = 150
+            image_height = image_width * (ih / float(iw))
+
+        for page_num in stamped_pages:
+            page = pages[page_num - 1]
+            c.setPageSize((float(page.mediabox.width), float(page.mediabox.height)))
+
+            for stamp in stamps_by_page[page_num]:
+                x = stamp['x']
+                y = stamp['y']
+                s_type = stamp.get('type', 'digital')
                 
-                for stamp in stamps_by_page[page_num]:
-                    x = stamp['x']
-                    y = stamp['y']
-                    s_type = stamp.get('type', 'digital')
-                    
-                    print(f"Stamping {s_type} on Page {page_num} at x={x}, y={y}")
-                    
-                    if s_type == 'digital':
-                        c.setStrokeColorRGB(0, 0.5, 0) # Green
-                        c.setFillColorRGB(0, 0.5, 0)
-                        c.rect(x, y, 150, 30, fill=0) # Draw a box
-                        c.drawString(x + 10, y + 10, f"Signed: {sig_id}")
-                    
-                    elif s_type == 'user' and user_image:
-                        try:
-                            # Decode base64 image
-                            img_str = user_image
-                            if "base64," in img_str:
-                                img_str = img_str.split("base64,")[1]
-                            
-                            img_data = base64.b64decode(img_str)
-                            img = ImageReader(io.BytesIO(img_data))
-                            
-                            # Calculate dimensions (max width 150)
-                            iw, ih = img.getSize()
-                            aspect = ih / float(iw)
-                            width = 150
-                            height = width * aspect
-                            
-                            # Draw image (y is bottom-left, so we might need to adjust if y was top-left in frontend)
-                            # Frontend sends PDF coordinates (bottom-left origin), so x,y are correct bottom-left of image
-                            c.drawImage(img, x, y, width=width, height=height, mask='auto')
-                        except Exception as e:
-                            print(f"Failed to draw user image: {e}")
+                print(f"Stamping {s_type} on Page {page_num} at x={x}, y={y}")
                 
-                c.save()
+                if s_type == 'digital':
+                    c.saveState()
+                    c.translate(x, y)
+                    c.doForm(DIGITAL_STAMP_FORM)
+                    c.restoreState()
                 
-                # Merge
-                packet.seek(0)
-                stamp_pdf = PdfReader(packet)
-                page.merge_page(stamp_pdf.pages[0])
-            
-            output.add_page(page)
-            
-        # Write the output
-        output_stream = io.BytesIO()
-        output.write(output_stream)
-        return output_stream.getvalue()
+                elif s_type == 'user' and img:
+                    try:
+                        # Frontend sends PDF coordinates (bottom-left origin), so x,y are correct bottom-left of image.
+                        # reportlab keys images by content, so every placement reuses the same XObject
+                        c.drawImage(img, x, y, width=image_width, height=image_height, mask='auto')
+                    except Exception as e:
+                        print(f"Failed to draw user image: {e}")
+
+            c.showPage()
+        c.save()
+
+        # Parse the overlay document once for all pages
+        packet.seek(0)
+        overlay_pdf = PdfReader(packet)
+        return {page_num: overlay_pdf.pages[i] for i, page_num in enumerate(stamped_pages)}
+
+    @staticmethod
+    def _define_digital_stamp(c: canvas.Canvas, sig_id: str):
+        """The "Signed: {sig_id}" box, drawn at the origin as a reusable form."""
+        c.beginForm(DIGITAL_STAMP_FORM, lowerx=-1, lowery=-1, upperx=DIGITAL_STAMP_WIDTH + 1, uppery=DIGITAL_STAMP_HEIGHT + 1)
+        c.setStrokeColorRGB(0, 0.5, 0) # Green
+        c.setFillColorRGB(0, 0.5, 0)
+        c.rect(0, 0, DIGITAL_STAMP_WIDTH, DIGITAL_STAMP_HEIGHT, fill=0) # Draw a box
+        c.drawString(10, 10, f"Signed: {sig_id}")
+        c.endForm()
+
+class IncrementalUpdate:
+    """
+    An incremental update section (PDF 32000-1, 7.5.6) appended to an existing file.
+    New and replaced objects are written after the original bytes together with a cross-reference
+    section of the same kind as the original (table or stream) whose /Prev links to the old one.
+    The original is read from its (seekable) stream: only its tail and last xref header are parsed here,
+    and write() copies it through in chunks.
+    """
+    def __init__(self, reader: PdfReader, original: BinaryIO):
+        if reader.is_encrypted:
+            raise ValueError("Encrypted PDFs can't be updated incrementally")
+        self.reader = reader
+        self.original = original
+        self.prev_xref, self.xref_stream, self.ends_with_newline = self._find_last_xref(original)
+        self.next_id = int(reader.trailer["/Size"])
+        self.objects = {}  # idnum -> (generation, object)
+        self._imported = {}  # (source document, idnum) -> IndirectObject
+
+    @staticmethod
+    def _find_last_xref(original: BinaryIO) -> tuple[int, bool, bool]:
+        """(offset of the last xref section, whether it is an xref stream, whether the file ends with a newline)"""
+        size = original.seek(0, os.SEEK_END)
+        original.seek(max(0, size - 2048))
+        tail = original.read()
+        pos = tail.rfind(b"startxref")
+        match = re.match(rb"startxref\s+(\d+)", tail[pos:]) if pos >= 0 else None
+        if not match:
+            raise ValueError("startxref not found")
+        offset = int(match.group(1))
+        ends_with_newline = tail.endswith((b"\n", b"\r"))
+        # If pypdf had to repair the file, /Prev would point at garbage; let the caller rewrite instead
+        original.seek(offset)
+        head = original.read(32) if offset < size else b""
+        if head.startswith(b"xref"):
+            return offset, False, ends_with_newline
+        if re.match(rb"\d+\s+\d+\s+obj", head):
+            return offset, True, ends_with_newline
+        raise ValueError("startxref doesn't point at a cross-reference section")
+
+    def add(self, obj) -> IndirectObject:
+        ref = IndirectObject(self.next_id, 0, None)
+        self.next_id += 1
+        self.objects[ref.idnum] = (0, obj)
+        return ref
+
+    def replace(self, ref: IndirectObject, obj):
+        self.objects[ref.idnum] = (ref.generation, obj)
+
+    def import_object(self, obj):
+        """
+        Makes an object graph from another document (the reportlab overlay) part of this update,
+        renumbering its indirect objects. The source objects are modified in place.
+        """
+        if isinstance(obj, IndirectObject):
+            if obj.pdf is None:
+                return obj  # Already ours
+            key = (id(obj.pdf), obj.idnum)
+            if key not in self._imported:
+                target = obj.get_object()
+                self._imported[key] = self.add(target)
+                self.import_object(target)
+            return self._imported[key]
+        if isinstance(obj, DictionaryObject):
+            for key, value in list(dict.items(obj)):
+                obj[key] = self.import_object(value)
+        elif isinstance(obj, ArrayObject):
+            for i, value in enumerate(obj):
+                obj[i] = self.import_object(value)
+        return obj
+
+    def _trailer(self) -> DictionaryObject:
+        trailer = DictionaryObject({
+            NameObject("/Size"): NumberObject(self.next_id),
+            NameObject("/Prev"): NumberObject(self.prev_xref),
+        })
+        for key in ("/Root", "/Info", "/ID"):
+            if key in self.reader.trailer:
+                trailer[NameObject(key)] = self.reader.trailer.raw_get(key)
+        return trailer
+
+    def write(self) -> bytes:
+        out = io.BytesIO()
+        self.original.seek(0)
+        shutil.copyfileobj(self.original, out, COPY_CHUNK_SIZE)
+        if not self.ends_with_newline:
+            out.write(b"\n")
+
+        offsets = {}
+        for idnum in sorted(self.objects):
+            generation, obj = self.objects[idnum]
+            offsets[idnum] = (out.tell(), generation)
+            out.write(f"{idnum} {generation} obj\n".encode())
+            obj.write_to_stream(out)
+            out.write(b"\nendobj\n")
+
+        if self.xref_stream:
+            self._write_xref_stream(out, offsets)
+        else:
+            self._write_xref_table(out, offsets)
+        return out.getvalue()
+
+    @staticmethod
+    def _runs(ids: list[int]) -> list[list[int]]:
+        """Splits sorted object numbers into consecutive runs (one xref subsection each)."""
+        runs = []
+        for idnum in ids:
+            if runs and idnum == runs[-1][-1] + 1:
+                runs[-1].append(idnum)
+            else:
+                runs.append([idnum])
+        return runs
+
+    def _write_xref_table(self, out: io.BytesIO, offsets: dict):
+        xref_offset = out.tell()
+        out.write(b"xref\n")
+        for run in self._runs(sorted(offsets)):
+            out.write(f"{run[0]} {len(run)}\n".encode())
+            for idnum in run:
+                offset, generation = offsets[idnum]
+                out.write(f"{offset:010d} {generation:05d} n\r\n".encode())
+        out.write(b"trailer\n")
+        self._trailer().write_to_stream(out)
+        out.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+    def _write_xref_stream(self, out: io.BytesIO, offsets: dict):
+        xref_id = self.next_id
+        self.next_id += 1
+        xref_offset = out.tell()
+        offsets[xref_id] = (xref_offset, 0)
+
+        width = max(4, (xref_offset.bit_length() + 7) // 8)
+        index, rows = [], []
+        for run in self._runs(sorted(offsets)):
+            index += [NumberObject(run[0]), NumberObject(len(run))]
+            for idnum in run:
+                offset, generation = offsets[idnum]
+                rows.append(b"\x01" + offset.to_bytes(width, "big") + generation.to_bytes(2, "big"))
+
+        xref = DecodedStreamObject()
+        xref.set_data(b"".join(rows))
+        xref = xref.flate_encode()
+        xref.update(self._trailer())
+        xref.update({
+            NameObject("/Type"): NameObject("/XRef"),
+            NameObject("/W"): ArrayObject([NumberObject(1), NumberObject(width), NumberObject(2)]),
+            NameObject("/Index"): ArrayObject(index),
+        })
+        out.write(f"{xref_id} 0 obj\n".encode())
+        xref.write_to_stream(out)
+        out.write(f"\nendobj\nstartxref\n{xref_offset}\n%%EOF\n".encode())
 
 pdf_service = PDFService()
+
+def stamp_pdf(file_content: bytes | str, sig_id: str, stamps: list[dict], user_image: str | bytes | None = None) -> bytes:
+    """Worker pool entry point (module-level so it can be pickled)."""
+    return pdf_service.stamp_pdf(file_content, sig_id, stamps, user_image)
@@ -0,0 +1,98 @@
+import io
+import os
+import base64
+import asyncio
+import hashlib
+import binascii
+from datetime import datetime
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.db_service import SignatureImage
+from services.cache_service import LRUCache
+
+# Stamps are drawn 150pt wide, so 600px keeps ~4x oversampling while bounding the stored size
+SIGNATURE_IMAGE_MAX_WIDTH = int(os.getenv("SIGNATURE_IMAGE_MAX_WIDTH", "600"))
+SIGNATURE_IMAGE_MAX_HEIGHT = int(os.getenv("SIGNATURE_IMAGE_MAX_HEIGHT", "300"))
+# Upper bound on the decoded upload, checked before handing it to Pillow
+SIGNATURE_IMAGE_MAX_UPLOAD_BYTES = int(os.getenv("SIGNATURE_IMAGE_MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+SIGNATURE_IMAGE_CACHE_MAX_BYTES = int(os.getenv("SIGNATURE_IMAGE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+class InvalidSignatureImage(ValueError):
+    pass
+
+def decode_data_url(value: str) -> bytes:
+    """Accepts a data URL or bare base64 string, as sent by the profile page."""
+    if "base64," in value:
+        value = value.split("base64,", 1)[1]
+    try:
+        raw = base64.b64decode(value, validate=False)
+    except (binascii.Error, ValueError):
+        raise InvalidSignatureImage("Signature image is not valid base64")
+    if not raw:
+        raise InvalidSignatureImage("Signature image is empty")
+    if len(raw) > SIGNATURE_IMAGE_MAX_UPLOAD_BYTES:
+        raise InvalidSignatureImage("Signature image is too large")
+    return raw
+
+def normalize(raw: bytes) -> tuple[bytes, int, int]:
+    """
+    Decodes any format Pillow reads, downscales to the configured bounds and re-encodes as an optimised PNG.
+    Returns (png_bytes, width, height).
+    """
+    try:
+        with Image.open(io.BytesIO(raw)) as img:
+            img = ImageOps.exif_transpose(img)
+            # Keep transparency so the signature blends into the page; drop everything else to RGB
+            has_alpha = img.mode in ("RGBA", "LA") or "transparency" in img.info
+            img = img.convert("RGBA" if has_alpha else "RGB")
+            img.thumbnail((SIGNATURE_IMAGE_MAX_WIDTH, SIGNATURE_IMAGE_MAX_HEIGHT), Image.LANCZOS)
+
+            out = io.BytesIO()
+            img.save(out, format="PNG", optimize=True)
+            return out.getvalue(), img.width, img.height
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise InvalidSignatureImage(f"Unsupported signature image: {e}")
+
+def to_data_url(png: bytes) -> str:
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+class SignatureImageService:
+    def __init__(self):
+        # Images are immutable once stored, so cached bytes never go stale
+        self.cache = LRUCache("signature_images", max_bytes=SIGNATURE_IMAGE_CACHE_MAX_BYTES)
+
+    async def store(self, db: AsyncSession, value: str) -> str:
+        """
+        Normalises a base64 / data URL image and stores it if it isn't there yet.
+        Returns the image ID; the caller commits the session.
+        The insert ignores an existing row, so concurrent uploads of the same image both succeed.
+        """
+        raw = decode_data_url(value)
+        png, width, height = await asyncio.to_thread(normalize, raw)
+        image_id = hashlib.sha256(png).hexdigest()
+
+        row = {"id": image_id, "png": png, "width": width, "height": height, "created_at": datetime.utcnow()}
+        insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+        if insert is not None:
+            await db.execute(insert(SignatureImage).values(**row).on_conflict_do_nothing(index_elements=["id"]))
+        else:
+            existing = await db.scalar(select(SignatureImage.id).where(SignatureImage.id == image_id))
+            if existing is None:
+                db.add(SignatureImage(**row))
+        return image_id
+
+    async def get(self, db: AsyncSession, image_id: str) -> bytes | None:
+        png = self.cache.get(image_id)
+        if png is None:
+            png = await db.scalar(select(SignatureImage.png).where(SignatureImage.id == image_id))
+            if png is not None:
+                self.cache.set(image_id, png)
+        return png
+
+signature_image_service = SignatureImageService()
@@ -0,0 +1,89 @@
+import asyncio
+from typing import Awaitable, Callable
+
+class Flight:
+    """One in-flight call: the shared task, the progress events it has published and who is listening."""
+    def __init__(self):
+        self.task = None
+        self.events = []  # (stage, data) in publish order, replayed to callers that join late
+        self.listeners = []
+        self.waiters = 0
+
+    def emit(self, stage: str, data: dict):
+        self.events.append((stage, data))
+        for listener in list(self.listeners):
+            listener(stage, data)
+
+class SingleFlight:
+    """
+    Coalesces concurrent async calls by key: the first caller starts the work and later callers
+    for the same key await the same task instead of repeating it.
+    The key is dropped as soon as the task finishes, successfully or not, so an exception reaches
+    every caller of that flight but the next call starts afresh.
+    The work is only cancelled once every caller waiting on it has been cancelled, and its key is dropped right then.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._flights = {}  # key -> Flight
+        self.started = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    async def run(self, key, fn: Callable[[Callable], Awaitable], on_event=None, on_done: Callable[[], None] | None = None):
+        """
+        Returns the result of fn(emit), calling it only if no flight for key is running.
+        on_event(stage, data), if given, receives every event the flight emit()s, including those published before this caller joined.
+        on_done(), if given, releases whatever fn reads (e.g. the caller's upload): it runs when the task this call started
+        has finished, which can be after this caller was cancelled, or right away if the call joined a running flight.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = Flight()
+            flight.task = asyncio.create_task(fn(flight.emit))
+            flight.task.add_done_callback(lambda task: self._finish(key, flight, task))
+            if on_done is not None:
+                flight.task.add_done_callback(lambda task: on_done())
+            self._flights[key] = flight
+            self.started += 1
+        else:
+            self.coalesced += 1
+            if on_done is not None:
+                on_done()
+            if on_event is not None:
+                for stage, data in list(flight.events):
+                    on_event(stage, data)
+
+        if on_event is not None:
+            flight.listeners.append(on_event)
+        flight.waiters += 1
+        try:
+            # Shielded so one caller going away doesn't cancel the work under the others
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1:
+                flight.task.cancel()
+                # Drop the key now rather than when the task winds down, so a new call doesn't join a cancelled flight
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            raise
+        finally:
+            flight.waiters -= 1
+            if on_event is not None:
+                flight.listeners.remove(on_event)
+
+    def _finish(self, key, flight: Flight, task: asyncio.Task):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Also marks the exception as retrieved when no caller is left to see it
+        if not task.cancelled() and task.exception() is not None:
+            self.failed += 1
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "in_flight": len(self._flights),
+            "waiting": sum(flight.waiters for flight in self._flights.values()),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+        }
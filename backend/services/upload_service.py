@@ -0,0 +1,174 @@
+import io
+import os
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+from fastapi import UploadFile, HTTPException
+from starlette.formparsers import MultiPartParser
+from starlette.responses import JSONResponse
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # 1 MB
+UPLOAD_SPOOL_THRESHOLD = int(os.getenv("UPLOAD_SPOOL_THRESHOLD", str(8 * 1024 * 1024)))  # Spill to disk above 8 MB
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))  # Reject above 200 MB
+UPLOAD_FORM_OVERHEAD = 64 * 1024  # Allowance for the multipart framing around the file in the request body
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+
+# Starlette spools multipart file parts itself (1 MB in memory by default); uploads are used where it put them
+MultiPartParser.spool_max_size = UPLOAD_SPOOL_THRESHOLD
+
+def too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File exceeds the {UPLOAD_MAX_BYTES} byte upload limit")
+
+class SpooledUpload:
+    """
+    A received upload: its SHA-256, its size and the content where Starlette spooled it,
+    in memory up to UPLOAD_SPOOL_THRESHOLD and in an (anonymous) temp file above it.
+    The content is detached from the request, so it stays readable after the form is closed, until close().
+    """
+    def __init__(self, filename: str | None, doc_hash: str, size: int):
+        self.filename = filename
+        self.doc_hash = doc_hash
+        self.size = size
+        self.content = None  # In-memory uploads
+        self.file = None  # Disk-spooled uploads: our own descriptor on Starlette's temp file
+        self._copy = None  # Named copy, only where other processes can't open self.file by descriptor
+
+    @property
+    def on_disk(self) -> bool:
+        return self.file is not None
+
+    def source(self) -> bytes | str | None:
+        """
+        A picklable handle on the content for other processes: the (small) in-memory bytes, or a path to the
+        spooled file. On Linux that path is /proc/<pid>/fd/<n>, so the file is never copied;
+        elsewhere a named copy is made the first time a path is needed.
+        """
+        if self.file is None:
+            return self.content
+        fd_path = f"/proc/{os.getpid()}/fd/{self.file.fileno()}"
+        if os.path.exists(fd_path):
+            return fd_path
+        if self._copy is None:
+            self._copy = tempfile.NamedTemporaryFile(prefix="upload_", suffix=".pdf", dir=UPLOAD_TMP_DIR)
+            self.file.seek(0)
+            shutil.copyfileobj(self.file, self._copy, UPLOAD_CHUNK_SIZE)
+            self._copy.flush()
+        return self._copy.name
+
+    def close(self):
+        for f in (self.file, self._copy):
+            if f is not None:
+                f.close()
+        self.file = None
+        self._copy = None
+        self.content = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+@contextmanager
+def open_source(source: bytes | str | BinaryIO) -> Iterator[BinaryIO]:
+    """
+    Yields a seekable binary stream at offset 0 for raw bytes, a file path or a binary file object.
+    Files opened here are closed on exit; caller-owned file objects are left open.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    elif isinstance(source, str):
+        with open(source, "rb") as f:
+            yield f
+    else:
+        source.seek(0)
+        yield source
+
+def read_all(source: bytes | str | BinaryIO) -> bytes:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    with open_source(source) as stream:
+        return stream.read()
+
+class UploadService:
+    async def receive(self, file: UploadFile, keep_content: bool = True) -> SpooledUpload:
+        """
+        Hashes the upload in place, reading Starlette's spooled file in UPLOAD_CHUNK_SIZE chunks (nothing is copied).
+        Raises 413 above UPLOAD_MAX_BYTES; UploadLimitMiddleware normally rejects such requests before the form is parsed.
+        With keep_content=False only the hash is kept (integrity checks).
+        """
+        if file.size is not None and file.size > UPLOAD_MAX_BYTES:
+            raise too_large()
+
+        sha256 = hashlib.sha256()
+        size = 0
+        await file.seek(0)
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > UPLOAD_MAX_BYTES:
+                raise too_large()
+            sha256.update(chunk)
+
+        upload = SpooledUpload(file.filename, sha256.hexdigest(), size)
+        if keep_content:
+            # Same test Starlette uses for UploadFile._in_memory
+            if getattr(file.file, "_rolled", True):
+                # A descriptor of our own keeps the temp file alive once FastAPI closes the form after the response
+                upload.file = os.fdopen(os.dup(file.file.fileno()), "rb")
+            else:
+                await file.seek(0)
+                upload.content = await file.read()
+        return upload
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware answering 413 to request bodies larger than UPLOAD_MAX_BYTES (plus the multipart framing)
+    before anything parses them: from Content-Length up front, or once a chunked body grows past the limit.
+    """
+    def __init__(self, app, max_bytes: int = UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self.reject(scope, receive, send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request" and not rejected:
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    rejected = True
+                    await self.reject(scope, receive, send)
+                    # Makes the body parser give up as if the client had gone away
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise
+
+    @staticmethod
+    async def reject(scope, receive, send):
+        response = JSONResponse({"detail": too_large().detail}, status_code=413)
+        await response(scope, receive, send)
+
+upload_service = UploadService()
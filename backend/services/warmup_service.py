@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import asyncio
+from services.db_service import init_db
+from services.crypto_service import crypto_service
+from services.worker_pool import worker_pool
+from agents.summary_agent import summary_agent, NLTK_DATA_DIR
+from agents.gemini_agent import gemini_agent
+
+# Subsystems preloaded in the background once the app is serving, so the first request doesn't pay for them.
+# Empty = load everything lazily on first use.
+WARMUP_SUBSYSTEMS = [name.strip() for name in os.getenv("WARMUP_SUBSYSTEMS", "worker_pool,pdf,nlp,gemini").split(",") if name.strip()]
+
+def load_pdf():
+    import services.pdf_service  # noqa: F401  (pypdf + reportlab)
+
+class WarmupService:
+    """
+    Start-up hook plus background warm-up, and the readiness report served at /ready.
+    Start-up only does what requests can't work without (schema, signing keys); heavy imports happen afterwards.
+    """
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.steps = {}  # name -> {"seconds": float, "error": str | None}
+        self.ready = False
+        self._task = None
+        self.loaders = {
+            "worker_pool": worker_pool.start,
+            "pdf": load_pdf,
+            "nlp": summary_agent.load,
+            "gemini": gemini_agent.load,
+        }
+
+    async def startup(self):
+        start = time.monotonic()
+        init_db()
+        self.steps["database"] = {"seconds": round(time.monotonic() - start, 3), "error": None}
+        await self._run("keys", crypto_service.ensure_keys)
+        self._task = asyncio.create_task(self.warm_up())
+
+    async def warm_up(self):
+        for name in WARMUP_SUBSYSTEMS:
+            if name not in self.loaders:
+                print(f"Warning: unknown warm-up subsystem {name!r}")
+                continue
+            await self._run(name, self.loaders[name])
+        self.ready = True
+        print(f"Warm-up complete in {time.monotonic() - self.started_at:.2f}s")
+
+    async def _run(self, name: str, loader):
+        start = time.monotonic()
+        error = None
+        try:
+            if asyncio.iscoroutinefunction(loader):
+                await loader()
+            else:
+                # Imports hold the GIL but at least don't stall the loop for their whole duration
+                await asyncio.to_thread(loader)
+        except Exception as e:
+            error = str(e)
+            print(f"Warm-up of {name} failed: {e}")
+        self.steps[name] = {"seconds": round(time.monotonic() - start, 3), "error": error}
+
+    def shutdown(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def subsystems(self) -> dict:
+        """What is loaded right now, whether by the warm-up or by a request that needed it first."""
+        loaded = {
+            "database": "database" in self.steps and self.steps["database"]["error"] is None,
+            "keys": crypto_service.private_key is not None,
+            "worker_pool": worker_pool.started,
+            "pdf": "pypdf" in sys.modules and "reportlab.pdfgen.canvas" in sys.modules,
+            "nlp": "numpy" in sys.modules and "sumy" in sys.modules,
+            "gemini": gemini_agent.loaded,
+        }
+        return {
+            name: {"loaded": is_loaded, **self.steps.get(name, {})}
+            for name, is_loaded in loaded.items()
+        }
+
+    def warnings(self) -> list[str]:
+        """Degraded-but-serving conditions worth a look from whoever watches /ready."""
+        warnings = []
+        if not summary_agent.lsa_available:
+            warnings.append(f"LSA summariser unavailable (NLTK punkt_tab data missing from {NLTK_DATA_DIR}), summaries use TextRank")
+        return warnings
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 3),
+            "subsystems": self.subsystems(),
+            "warnings": self.warnings(),
+        }
+
+warmup_service = WarmupService()
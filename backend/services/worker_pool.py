@@ -0,0 +1,84 @@
+import os
+import sys
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Number of worker processes for PDF / NLP work. 0 runs the work in the default thread pool instead.
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", str(os.cpu_count() or 1)))
+# Recycle a worker after this many tasks to bound memory growth from pypdf / NLP caches. 0 = never.
+# Needs Python 3.11+ (max_tasks_per_child), as in the Dockerfile; older versions never recycle.
+WORKER_MAX_TASKS_PER_CHILD = int(os.getenv("WORKER_MAX_TASKS_PER_CHILD", "200"))
+# "spawn" avoids forking a process that already runs the event loop and its threads
+WORKER_START_METHOD = os.getenv("WORKER_START_METHOD", "spawn")
+
+def _warm_up():
+    """Worker initializer: pays the heavy import cost (pypdf, reportlab, NumPy / Sumy) once per process."""
+    import pypdf  # noqa: F401
+    import services.pdf_service  # noqa: F401
+    from agents.summary_agent import summary_agent
+    summary_agent.load()
+
+def _ping() -> int:
+    return os.getpid()
+
+class WorkerPool:
+    def __init__(self, processes: int = WORKER_PROCESSES):
+        self.processes = processes
+        self._executor = None
+        self.started = False  # All workers spawned and warmed up
+
+    @property
+    def enabled(self) -> bool:
+        return self.processes > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            kwargs = {
+                "max_workers": self.processes,
+                "mp_context": multiprocessing.get_context(WORKER_START_METHOD),
+                "initializer": _warm_up,
+            }
+            if WORKER_MAX_TASKS_PER_CHILD > 0 and sys.version_info >= (3, 11):
+                kwargs["max_tasks_per_child"] = WORKER_MAX_TASKS_PER_CHILD
+            self._executor = ProcessPoolExecutor(**kwargs)
+        return self._executor
+
+    async def start(self):
+        """Spawns and warms up every worker so the first request doesn't pay for process start-up and imports."""
+        if not self.enabled:
+            self.started = True
+            return
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        # Submitting one task per worker before any completes makes the executor spawn all of them
+        await asyncio.gather(*[loop.run_in_executor(executor, _ping) for _ in range(self.processes)])
+        self.started = True
+        print(f"Worker pool ready: {self.processes} processes")
+
+    async def run(self, fn, *args):
+        """
+        Runs fn(*args) in a worker process and awaits the result.
+        fn must be a module-level function and args picklable.
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args)
+        if not self.enabled:
+            return await loop.run_in_executor(None, call)
+
+        try:
+            return await loop.run_in_executor(self._get_executor(), call)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge PDF); replace the pool so later requests still work
+            self.shutdown(wait=False)
+            raise
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+            self.started = False
+
+worker_pool = WorkerPool()
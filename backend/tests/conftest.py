@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Keep imports of the service modules away from the real database and audit trail
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='eds-tests-'), 'test.db')}")
+os.environ.setdefault("AUDIT_LOG_PATH", "")
+os.environ.setdefault("AUDIT_CONSOLE", "false")
+os.environ.setdefault("WORKER_PROCESSES", "0")
+os.environ.setdefault("WARMUP_SUBSYSTEMS", "")
@@ -0,0 +1,123 @@
+import json
+import pytest
+import agents.audit_agent as audit_module
+from agents.audit_agent import AuditAgent, chain_tail, verify_chain, claim_slot, GENESIS_HASH
+
+@pytest.fixture
+def audit_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_module, "AUDIT_HASH_CHAIN", True)
+    monkeypatch.setattr(audit_module, "AUDIT_CONSOLE", False)
+    return str(tmp_path / "audit.jsonl")
+
+def write_events(path: str, count: int, prefix: str = "EVENT"):
+    agent = AuditAgent()
+    agent.template = path
+    for i in range(count):
+        agent.log_action(prefix, f"event {i}", index=i)
+    agent.shutdown()
+    return agent
+
+def test_chain_verifies(audit_path):
+    agent = write_events(audit_path, 25)
+    ok, batches, problem = verify_chain(audit_path)
+    assert ok and problem is None
+    assert batches == agent.batches >= 1
+    assert agent.written == 25
+
+def test_restarted_writer_continues_the_chain(audit_path):
+    write_events(audit_path, 5)
+    first_hash, offset = chain_tail(audit_path)
+    write_events(audit_path, 5)
+    ok, batches, _ = verify_chain(audit_path)
+    assert ok and batches >= 2
+    with open(audit_path, "rb") as f:
+        lines = f.read().splitlines()
+    assert any(json.loads(line).get("chain", {}).get("prev") == first_hash for line in lines)
+
+def test_edited_event_is_detected(audit_path):
+    write_events(audit_path, 5)
+    with open(audit_path) as f:
+        content = f.read()
+    with open(audit_path, "w") as f:
+        f.write(content.replace("event 3", "event 9"))
+    ok, _, problem = verify_chain(audit_path)
+    assert not ok and "hash" in problem
+
+def test_deleted_batch_is_detected(audit_path):
+    for _ in range(2):
+        write_events(audit_path, 2)
+    with open(audit_path, "rb") as f:
+        lines = f.readlines()
+    first_chain = next(i for i, line in enumerate(lines) if line.startswith(b'{"chain"'))
+    with open(audit_path, "wb") as f:
+        f.writelines(lines[first_chain + 1:])
+    ok, _, problem = verify_chain(audit_path)
+    assert not ok and "follow" in problem
+
+def test_crash_leftovers_are_reported_then_sealed(audit_path):
+    write_events(audit_path, 3)
+    # A writer that died mid-batch: whole event lines without their chain record, then a torn line
+    with open(audit_path, "ab") as f:
+        f.write(b'{"ts":"x","action":"LOST","level":"info","details":"","pid":1}\n')
+        f.write(b'{"chain":{"prev":"ab')
+    ok, _, problem = verify_chain(audit_path)
+    assert not ok and "after the last chain record" in problem
+
+    write_events(audit_path, 2)
+    ok, batches, problem = verify_chain(audit_path)
+    assert ok, problem
+    with open(audit_path, "rb") as f:
+        records = [json.loads(line) for line in f if line.startswith(b'{"chain":{"prev":"') and line.rstrip().endswith(b"}}")]
+    recovered = [record["chain"] for record in records if record["chain"].get("recovered")]
+    assert len(recovered) == 1 and recovered[0]["events"] == 2
+
+def test_chain_tail_scans_back_past_small_blocks(audit_path, monkeypatch):
+    write_events(audit_path, 3)
+    expected = chain_tail(audit_path)
+    # Many unchained lines after the last record, far more than one block
+    with open(audit_path, "ab") as f:
+        f.write(b'{"action":"LOST"}\n' * 50)
+    monkeypatch.setattr(audit_module, "TAIL_BLOCK_SIZE", 16)
+    assert chain_tail(audit_path) == expected
+
+def test_chain_tail_of_missing_or_unchained_file(tmp_path):
+    assert chain_tail(str(tmp_path / "missing.jsonl")) == (GENESIS_HASH, 0)
+    path = tmp_path / "plain.jsonl"
+    path.write_bytes(b'{"action":"A"}\n{"action":"B"}\n')
+    assert chain_tail(str(path)) == (GENESIS_HASH, 0)
+
+def test_concurrent_writers_get_their_own_slots(tmp_path):
+    template = str(tmp_path / "audit-{worker}.jsonl")
+    first, first_lock = claim_slot(template)
+    second, second_lock = claim_slot(template)
+    assert first.endswith("audit-0.jsonl") and second.endswith("audit-1.jsonl")
+    # A slot is free again once its holder is gone (the OS drops the lock when a process dies)
+    first_lock.close()
+    assert claim_slot(template)[0] == first
+    second_lock.close()
+
+def test_restarted_writer_reuses_its_slot_and_chain(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_module, "AUDIT_HASH_CHAIN", True)
+    monkeypatch.setattr(audit_module, "AUDIT_CONSOLE", False)
+    template = str(tmp_path / "audit-{worker}.jsonl")
+    for _ in range(3):
+        write_events(template, 2)
+    assert sorted(path.name for path in tmp_path.glob("*.jsonl")) == ["audit-0.jsonl"]
+    ok, batches, problem = verify_chain(template)
+    assert ok and batches >= 3, problem
+
+def test_verifying_the_set_detects_a_deleted_slot(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_module, "AUDIT_HASH_CHAIN", True)
+    monkeypatch.setattr(audit_module, "AUDIT_CONSOLE", False)
+    template = str(tmp_path / "audit-{worker}.jsonl")
+    locks = [claim_slot(template)[1] for _ in range(2)]  # Busy slots 0 and 1, as if two workers were running
+    write_events(template, 2)
+    for lock in locks:
+        lock.close()
+    write_events(str(tmp_path / "audit-0.jsonl"), 2)
+    write_events(str(tmp_path / "audit-1.jsonl"), 2)
+    assert verify_chain(template)[0]
+
+    (tmp_path / "audit-1.jsonl").unlink()
+    ok, _, problem = verify_chain(template)
+    assert not ok and "audit-1.jsonl is missing" in problem
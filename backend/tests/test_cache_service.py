@@ -0,0 +1,56 @@
+import services.cache_service as cache_module
+from services.cache_service import LRUCache
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = LRUCache("test", max_bytes=10)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    assert cache.get("a") == b"1234"  # "b" is now the least recently used
+    cache.set("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234" and cache.get("c") == b"1234"
+    stats = cache.stats()
+    assert stats["bytes"] == 8 and stats["evictions"] == 1
+
+def test_value_larger_than_the_cache_is_not_stored():
+    cache = LRUCache("test", max_bytes=10)
+    cache.set("a", b"1234")
+    cache.set("huge", b"x" * 11)
+    assert cache.get("huge") is None
+    assert cache.get("a") == b"1234"
+
+def test_replacing_a_key_updates_its_size():
+    cache = LRUCache("test", max_bytes=10)
+    cache.set("a", b"12345678")
+    cache.set("a", b"12")
+    cache.set("b", b"12345678")
+    assert cache.stats()["bytes"] == 10
+    assert cache.get("a") == b"12"
+
+def test_evicts_by_entry_count():
+    cache = LRUCache("test", max_entries=2)
+    for key in "abc":
+        cache.set(key, key)
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 2
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = LRUCache("test", max_bytes=100, ttl=5)
+    cache.set("a", b"1234")
+    now[0] += 4.9
+    assert cache.get("a") == b"1234"
+    now[0] += 0.2
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["bytes"] == 0 and stats["hits"] == 1 and stats["misses"] == 1
+
+def test_invalidate_and_clear():
+    cache = LRUCache("test", max_bytes=100)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.invalidate("a")
+    assert cache.get("a") is None and cache.stats()["bytes"] == 1
+    cache.clear()
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
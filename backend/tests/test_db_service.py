@@ -0,0 +1,29 @@
+from services.db_service import to_async_url, engine_options, DB_POOL_SIZE, DB_SYNC_POOL_SIZE
+
+def test_sqlite_url_uses_aiosqlite():
+    assert to_async_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+
+def test_postgres_url_uses_asyncpg():
+    assert to_async_url("postgresql://user:pw@host/db") == "postgresql+asyncpg://user:pw@host/db"
+    assert to_async_url("postgres://user:pw@host/db") == "postgresql+asyncpg://user:pw@host/db"
+    assert to_async_url("postgresql+psycopg2://user:pw@host/db") == "postgresql+asyncpg://user:pw@host/db"
+
+def test_neon_url_translates_sslmode():
+    url = "postgresql://user:pw@ep-cool-name.eu-central-1.aws.neon.tech/neondb?sslmode=require&channel_binding=require"
+    assert to_async_url(url) == "postgresql+asyncpg://user:pw@ep-cool-name.eu-central-1.aws.neon.tech/neondb?ssl=require"
+
+def test_other_query_parameters_are_kept():
+    url = "postgresql://user:pw@host/db?sslmode=verify-full&application_name=eds"
+    assert to_async_url(url) == "postgresql+asyncpg://user:pw@host/db?ssl=verify-full&application_name=eds"
+
+def test_async_url_is_dialect_compatible():
+    from sqlalchemy.engine import make_url
+    url = make_url(to_async_url("postgresql://user:pw@host/db?sslmode=require"))
+    assert url.drivername == "postgresql+asyncpg"
+    assert url.query == {"ssl": "require"}
+
+def test_sync_engine_gets_its_own_smaller_pool():
+    url = "postgresql://user:pw@host/db"
+    assert engine_options(url)["pool_size"] == DB_POOL_SIZE
+    assert engine_options(url, DB_SYNC_POOL_SIZE, 3) == {**engine_options(url), "pool_size": DB_SYNC_POOL_SIZE, "max_overflow": 3}
+    assert "pool_size" not in engine_options("sqlite:///./test.db", DB_SYNC_POOL_SIZE, 3)
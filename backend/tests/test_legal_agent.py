@@ -0,0 +1,84 @@
+import re
+import random
+from agents.legal_agent import LegalAgent, keyword_trie_pattern
+
+def reference_analyze(text: str) -> dict:
+    """The hand-written checks legal_rules.json replaced, kept verbatim as the parity reference."""
+    analysis = {"summary_points": [], "red_flags": [], "risk_score": 0}
+    lower_text = text.lower()
+
+    term_match = re.search(r"(term|duration) of this agreement shall be for a period of\s*(\d+\s*\w+)", lower_text)
+    if term_match:
+        analysis["summary_points"].append(f"Contract Duration: {term_match.group(2)}")
+
+    if "termination for convenience" in lower_text:
+        analysis["summary_points"].append("Includes 'Termination for Convenience' clause (can be cancelled anytime).")
+    elif "termination" in lower_text:
+        analysis["summary_points"].append("Contains standard termination clauses.")
+
+    if "indefinite" in lower_text or "perpetual" in lower_text:
+        if "license" not in lower_text:
+            analysis["red_flags"].append("Contains 'Indefinite' or 'Perpetual' obligations.")
+            analysis["risk_score"] += 20
+
+    if "non-compete" in lower_text or "non compete" in lower_text:
+        analysis["red_flags"].append("Contains a Non-Compete clause. Verify the duration and scope.")
+        analysis["risk_score"] += 30
+
+    if "jurisdiction" in lower_text:
+        if "delaware" not in lower_text and "california" not in lower_text and "new york" not in lower_text:
+            analysis["summary_points"].append("Check Jurisdiction clause (might be a specific foreign state).")
+
+    if "liquidated damages" in lower_text or "penalty" in lower_text:
+        analysis["red_flags"].append("Contains 'Liquidated Damages' or 'Penalty' clauses.")
+        analysis["risk_score"] += 15
+
+    if "arbitration" in lower_text:
+        analysis["summary_points"].append("Requires Arbitration (waives right to court trial).")
+
+    if "indemnify" in lower_text or "hold harmless" in lower_text:
+        analysis["summary_points"].append("Contains Indemnification obligations (you pay for their losses).")
+        analysis["risk_score"] += 10
+
+    analysis["risk_score"] = min(analysis["risk_score"], 100)
+    if not analysis["summary_points"] and not analysis["red_flags"]:
+        analysis["summary_points"].append("No specific key terms detected. Standard review recommended.")
+    return analysis
+
+FRAGMENTS = [
+    "Termination for Convenience", "termination", "TERMINATION for", "indefinite", "perpetual", "license", "Licensed",
+    "non-compete", "non compete", "NON-COMPETE", "jurisdiction", "Delaware", "california", "New York",
+    "liquidated damages", "penalty", "arbitration", "indemnify", "hold harmless", "harmless", "hold",
+    "The term of this agreement shall be for a period of 2 Years", "duration of this agreement shall be for a period of12months",
+    "term of this agreement shall be for a period of", "lorem", "ipsum", "the", "party", "İstanbul",
+]
+SEPARATORS = [" ", " ", "\n", "", "-", ". "]
+
+def random_text(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(0, 12)):
+        parts.append(rng.choice(FRAGMENTS))
+        parts.append(rng.choice(SEPARATORS))
+    return "".join(parts)
+
+def test_rule_engine_matches_reference_on_random_texts():
+    agent = LegalAgent()
+    rng = random.Random(18)
+    for _ in range(5000):
+        text = random_text(rng)
+        analysis = agent.analyze(text)
+        analysis.pop("clauses")
+        assert analysis == reference_analyze(text), text
+
+def test_clauses_are_located_on_their_pages():
+    text = "Page one term.\nThe parties agree to arbitration.\nNon-compete applies"
+    analysis = LegalAgent().analyze(text, [0, 15, 49])
+    clauses = {clause["rule"]: clause for clause in analysis["clauses"]}
+    assert clauses["arbitration"]["page"] == 2
+    assert clauses["non_compete"]["page"] == 3
+    for clause in analysis["clauses"]:
+        assert text[clause["start"]:clause["end"]] == clause["text"]
+
+def test_keyword_trie_prefers_the_longest_keyword():
+    pattern = re.compile(keyword_trie_pattern(["pen", "penalty", "perpetual"]))
+    assert [m.group() for m in pattern.finditer("penalty pen perpetual")] == ["penalty", "pen", "perpetual"]
@@ -0,0 +1,120 @@
+import io
+import re
+import pytest
+from pypdf import PdfReader
+from reportlab.pdfgen import canvas
+import services.pdf_service as pdf_module
+from services.pdf_service import pdf_service
+
+def make_pdf(pages: int) -> bytes:
+    out = io.BytesIO()
+    c = canvas.Canvas(out)
+    for i in range(pages):
+        c.drawString(72, 700, f"Agreement page {i + 1}")
+        c.showPage()
+    c.save()
+    return out.getvalue()
+
+def last_startxref(pdf: bytes) -> int:
+    return int(re.findall(rb"startxref\s+(\d+)", pdf)[-1])
+
+def stamp(pdf, pages: tuple, sig_id: str = "SIG123") -> bytes:
+    stamps = [{"page": page, "x": 300, "y": 100, "type": "digital"} for page in pages]
+    return pdf_service.stamp_pdf(pdf, sig_id, stamps)
+
+@pytest.fixture(autouse=True)
+def incremental_mode(monkeypatch):
+    monkeypatch.setattr(pdf_module, "PDF_STAMP_MODE", "incremental")
+
+def test_incremental_update_appends_to_the_original():
+    original = make_pdf(5)
+    stamped = stamp(original, (2, 5))
+
+    assert stamped.startswith(original)
+    reader = PdfReader(io.BytesIO(stamped), strict=True)
+    assert reader.trailer["/Prev"] == last_startxref(original)
+    assert len(reader.pages) == 5
+    texts = [page.extract_text() for page in reader.pages]
+    assert ["Signed: SIG123" in text for text in texts] == [False, True, False, False, True]
+    assert all(f"Agreement page {i + 1}" in text for i, text in enumerate(texts))
+
+def test_repeated_updates_chain_their_xref_sections():
+    original = make_pdf(3)
+    once = stamp(original, (1,), "FIRST")
+    twice = stamp(once, (3,), "SECOND")
+
+    assert twice.startswith(once)
+    reader = PdfReader(io.BytesIO(twice), strict=True)
+    assert reader.trailer["/Prev"] == last_startxref(once)
+    texts = [page.extract_text() for page in reader.pages]
+    assert "Signed: FIRST" in texts[0] and "Signed: SECOND" in texts[2]
+
+def build_pdf(objects: list[bytes]) -> bytes:
+    """A classic-xref PDF from the bodies of objects 1..n (object 1 is the catalog)."""
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f\r\n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n\r\n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+def stream_object(data: bytes, extra: bytes = b"") -> bytes:
+    return b"<< /Length %d %s >>\nstream\n%s\nendstream" % (len(data), extra, data)
+
+def test_indirect_resources_are_updated_incrementally():
+    # As LibreOffice and pdfTeX write them: /Resources and its /XObject are references, not inline dictionaries
+    original = build_pdf([
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources 4 0 R /Contents 5 0 R >>",
+        b"<< /Font << /F1 6 0 R >> /XObject 7 0 R >>",
+        stream_object(b"BT /F1 12 Tf 72 700 Td (Agreement page 1) Tj ET q /Fx1 Do Q"),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Fx1 8 0 R >>",
+        stream_object(b"0 0 m 10 10 l S", b"/Type /XObject /Subtype /Form /BBox [0 0 10 10]"),
+    ])
+    stamped = stamp(original, (1,))
+
+    assert stamped.startswith(original)
+    reader = PdfReader(io.BytesIO(stamped), strict=True)
+    assert reader.trailer["/Prev"] == last_startxref(original)
+    page = reader.pages[0]
+    assert "Agreement page 1" in page.extract_text() and "Signed: SIG123" in page.extract_text()
+    xobjects = page["/Resources"]["/XObject"]
+    assert "/Fx1" in xobjects and "/EdsStamp" in xobjects
+    assert "/F1" in page["/Resources"]["/Font"]
+
+def test_file_path_source_is_streamed(tmp_path):
+    original = make_pdf(2)
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(original)
+    assert stamp(str(path), (1,)) == stamp(original, (1,))
+
+def test_broken_xref_falls_back_to_rewrite():
+    original = make_pdf(2)
+    broken = original[:original.rindex(b"startxref")] + b"startxref\n9\n%%EOF\n"
+    stamped = stamp(broken, (2,))
+
+    assert not stamped.startswith(broken)
+    reader = PdfReader(io.BytesIO(stamped))
+    assert "Signed: SIG123" in reader.pages[1].extract_text()
+
+def test_xref_stream_original_gets_an_xref_stream_update():
+    pikepdf = pytest.importorskip("pikepdf")
+    source = pikepdf.open(io.BytesIO(make_pdf(3)))
+    buffer = io.BytesIO()
+    source.save(buffer, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+    original = buffer.getvalue()
+
+    stamped = stamp(original, (2,))
+    assert stamped.startswith(original)
+    tail = stamped[len(original):]
+    assert b"/XRef" in tail and b"\nxref\n" not in tail
+    reader = PdfReader(io.BytesIO(stamped), strict=True)
+    assert "Signed: SIG123" in reader.pages[1].extract_text()
@@ -0,0 +1,59 @@
+import io
+import base64
+import asyncio
+import pytest
+from PIL import Image
+from fastapi.testclient import TestClient
+from sqlalchemy import select, func
+from services.db_service import init_db, AsyncSessionLocal, SignatureImage
+from services.signature_image_service import signature_image_service
+
+def png_data_url(color: tuple) -> str:
+    out = io.BytesIO()
+    Image.new("RGB", (40, 20), color).save(out, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(out.getvalue()).decode()
+
+@pytest.fixture(scope="module")
+def client():
+    import main
+    with TestClient(main.app) as client:
+        yield client
+
+def login(client: TestClient, email: str) -> dict:
+    client.post("/register", json={"full_name": "Test User", "email": email, "password": "secret-pass", "is_company": False})
+    token = client.post("/login", data={"username": email, "password": "secret-pass"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def test_concurrent_stores_of_one_image_both_succeed():
+    init_db()
+    image = png_data_url((10, 20, 30))
+
+    async def store_and_commit(db):
+        image_id = await signature_image_service.store(db, image)
+        await db.commit()
+        return image_id
+
+    async def scenario():
+        # The second request stores and commits while the first one's transaction is still open
+        async with AsyncSessionLocal() as first, AsyncSessionLocal() as second:
+            first_id = await signature_image_service.store(first, image)
+            concurrent = asyncio.create_task(store_and_commit(second))
+            await asyncio.sleep(0.2)
+            await first.commit()
+            ids = [first_id, await concurrent]
+        async with AsyncSessionLocal() as db:
+            rows = await db.scalar(select(func.count()).select_from(SignatureImage).where(SignatureImage.id == ids[0]))
+        return ids, rows
+
+    ids, rows = asyncio.run(scenario())
+    assert len(set(ids)) == 1 and rows == 1
+
+def test_signature_image_is_only_served_to_its_owner(client):
+    owner = login(client, "owner@example.com")
+    other = login(client, "other@example.com")
+    image_id = client.post("/me/signature", json={"signature_image": png_data_url((200, 0, 0))}, headers=owner).json()["signature_image_id"]
+
+    response = client.get(f"/signature-images/{image_id}", headers=owner)
+    assert response.status_code == 200 and response.headers["content-type"] == "image/png"
+    assert client.get(f"/signature-images/{image_id}", headers=other).status_code == 404
+    assert client.get(f"/signature-images/{image_id}").status_code == 401
@@ -0,0 +1,183 @@
+import os
+import asyncio
+import tempfile
+import pytest
+from fastapi import UploadFile
+from services.upload_service import upload_service, SpooledUpload
+from services.singleflight_service import SingleFlight
+
+async def spooled_on_disk(content: bytes) -> SpooledUpload:
+    spooled = tempfile.SpooledTemporaryFile(max_size=1)
+    spooled.write(content)
+    form_file = UploadFile(spooled, filename="doc.pdf")
+    upload = await upload_service.receive(form_file)
+    # As FastAPI does once the response is sent
+    await form_file.close()
+    assert upload.on_disk
+    return upload
+
+def test_cancelled_leader_keeps_upload_until_follower_is_served():
+    async def scenario():
+        flights = SingleFlight("test")
+        gate = asyncio.Event()
+        leader_upload = await spooled_on_disk(b"leader bytes")
+        follower_upload = await spooled_on_disk(b"leader bytes")
+        path = leader_upload.source()
+
+        async def work(emit):
+            await gate.wait()
+            with open(path, "rb") as f:
+                return f.read()
+
+        leader = asyncio.create_task(flights.run("doc", work, on_done=leader_upload.close))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.run("doc", work, on_done=follower_upload.close))
+        await asyncio.sleep(0)
+        # The follower's own copy is not needed: it is released as soon as it joins
+        assert not follower_upload.on_disk
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert os.path.exists(path)
+
+        gate.set()
+        assert await follower == b"leader bytes"
+        await asyncio.sleep(0)
+        assert not os.path.exists(path)
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_cancelling_every_waiter_cancels_the_work_and_releases():
+    async def scenario():
+        flights = SingleFlight("test")
+        upload = await spooled_on_disk(b"x" * 10)
+        path = upload.source()
+        started = asyncio.Event()
+
+        async def work(emit):
+            started.set()
+            await asyncio.sleep(60)
+
+        first = asyncio.create_task(flights.run("doc", work, on_done=upload.close))
+        second = asyncio.create_task(flights.run("doc", work))
+        await started.wait()
+        first.cancel()
+        second.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert not os.path.exists(path)
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_call_right_after_every_waiter_was_cancelled_starts_afresh():
+    async def scenario():
+        flights = SingleFlight("test")
+        started = asyncio.Event()
+
+        async def stuck(emit):
+            started.set()
+            await asyncio.sleep(60)
+
+        async def work(emit):
+            return "fresh"
+
+        waiters = [asyncio.create_task(flights.run("doc", stuck)) for _ in range(2)]
+        await started.wait()
+        for waiter in waiters:
+            waiter.cancel()
+        for waiter in waiters:
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        assert await flights.run("doc", work) == "fresh"
+        assert flights.stats()["started"] == 2
+
+    asyncio.run(scenario())
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flights = SingleFlight("test")
+        calls = 0
+
+        async def work(emit):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*[flights.run("doc", work) for _ in range(5)])
+        assert results == ["result"] * 5 and calls == 1
+        stats = flights.stats()
+        assert stats["started"] == 1 and stats["coalesced"] == 4 and stats["in_flight"] == 0
+
+        # Finished flights are forgotten, so the next call runs the work again
+        await flights.run("doc", work)
+        assert calls == 2
+
+    asyncio.run(scenario())
+
+def test_failure_reaches_every_caller_and_next_call_retries():
+    async def scenario():
+        flights = SingleFlight("test")
+        attempts = 0
+
+        async def work(emit):
+            nonlocal attempts
+            attempts += 1
+            await asyncio.sleep(0.01)
+            if attempts == 1:
+                raise RuntimeError("boom")
+            return "ok"
+
+        results = await asyncio.gather(flights.run("doc", work), flights.run("doc", work), return_exceptions=True)
+        assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+        assert flights.stats()["failed"] == 1
+        assert await flights.run("doc", work) == "ok"
+
+    asyncio.run(scenario())
+
+def test_late_joiner_gets_earlier_events_replayed():
+    async def scenario():
+        flights = SingleFlight("test")
+        halfway = asyncio.Event()
+        gate = asyncio.Event()
+
+        async def work(emit):
+            emit("first", {"n": 1})
+            halfway.set()
+            await gate.wait()
+            emit("second", {"n": 2})
+            return "done"
+
+        early, late = [], []
+        first = asyncio.create_task(flights.run("doc", work, on_event=lambda stage, data: early.append(stage)))
+        await halfway.wait()
+        second = asyncio.create_task(flights.run("doc", work, on_event=lambda stage, data: late.append(stage)))
+        await asyncio.sleep(0)
+        gate.set()
+        assert await asyncio.gather(first, second) == ["done", "done"]
+        assert early == late == ["first", "second"]
+
+    asyncio.run(scenario())
+
+def test_one_cancelled_caller_does_not_cancel_the_others():
+    async def scenario():
+        flights = SingleFlight("test")
+        gate = asyncio.Event()
+
+        async def work(emit):
+            await gate.wait()
+            return "done"
+
+        first = asyncio.create_task(flights.run("doc", work))
+        second = asyncio.create_task(flights.run("doc", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        assert await second == "done"
+        assert first.cancelled()
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+import io
+import asyncio
+import hashlib
+import tempfile
+import pytest
+from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi.testclient import TestClient
+import services.upload_service as upload_module
+from services.upload_service import upload_service, UploadLimitMiddleware, open_source
+
+def form_file(content: bytes, max_size: int) -> UploadFile:
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_size)
+    spooled.write(content)
+    return UploadFile(spooled, filename="doc.pdf")
+
+def test_small_upload_is_kept_in_memory():
+    content = b"%PDF-1.4 small"
+    upload = asyncio.run(upload_service.receive(form_file(content, max_size=1024)))
+    assert upload.doc_hash == hashlib.sha256(content).hexdigest()
+    assert upload.size == len(content)
+    assert not upload.on_disk and upload.source() == content
+
+def test_disk_upload_outlives_the_form_file():
+    content = b"%PDF-1.4 " + b"x" * 5000
+
+    async def receive():
+        file = form_file(content, max_size=1024)
+        upload = await upload_service.receive(file)
+        await file.close()
+        return upload
+
+    with asyncio.run(receive()) as upload:
+        assert upload.on_disk
+        assert upload.doc_hash == hashlib.sha256(content).hexdigest()
+        with open_source(upload.source()) as stream:
+            assert stream.read() == content
+    assert upload.source() is None
+
+def test_hash_only_upload_keeps_no_content():
+    upload = asyncio.run(upload_service.receive(form_file(b"abc", max_size=1), keep_content=False))
+    assert upload.doc_hash == hashlib.sha256(b"abc").hexdigest()
+    assert upload.source() is None
+
+def test_receive_rejects_oversized_upload(monkeypatch):
+    monkeypatch.setattr(upload_module, "UPLOAD_MAX_BYTES", 10)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(upload_service.receive(form_file(b"x" * 11, max_size=1024)))
+    assert error.value.status_code == 413
+
+@pytest.fixture
+def limited_client():
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, max_bytes=1000)
+    parsed = []
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        parsed.append(file.filename)
+        return {"size": file.size}
+
+    return TestClient(app), parsed
+
+def test_middleware_rejects_on_content_length(limited_client):
+    client, parsed = limited_client
+    response = client.post("/upload", files={"file": ("big.pdf", b"x" * 2000, "application/pdf")})
+    assert response.status_code == 413
+    assert parsed == []
+
+def test_middleware_rejects_chunked_body(limited_client):
+    client, parsed = limited_client
+
+    def body():
+        for _ in range(10):
+            yield b"x" * 500
+
+    response = client.post("/upload", content=body(), headers={"content-type": "multipart/form-data; boundary=abc"})
+    assert response.status_code == 413
+    assert parsed == []
+
+def test_middleware_passes_small_uploads(limited_client):
+    client, parsed = limited_client
+    response = client.post("/upload", files={"file": ("small.pdf", b"x" * 100, "application/pdf")})
+    assert response.status_code == 200 and response.json() == {"size": 100}
+    assert parsed == ["small.pdf"]
@@ -0,0 +1,23 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import routes.verify as verify_routes
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(verify_routes, "VERIFY_BATCH_MAX_ITEMS", 3)
+    app = FastAPI()
+    app.include_router(verify_routes.router)
+    return TestClient(app)
+
+def test_batch_over_the_limit_is_rejected(client):
+    response = client.post("/verify/batch", json={"sig_ids": ["a", "b"], "doc_hashes": ["c", "d"]})
+    assert response.status_code == 413
+
+def test_batch_within_the_limit_is_streamed(client):
+    from services.db_service import init_db
+    init_db()
+    response = client.post("/verify/batch", json={"sig_ids": ["a", "b"], "doc_hashes": ["c"]})
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert len(lines) == 3 and all('"valid":false' in line for line in lines)
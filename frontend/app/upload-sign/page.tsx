@@ -139,6 +139,18 @@ export default function UploadSign() {
         }
     };
 
+    // Analysis stored by an earlier upload of the same file, looked up by its SHA-256 without re-sending it
+    const fetchStoredAnalysis = async (file: File) => {
+        if (!window.crypto?.subtle) return null;
+        try {
+            const digest = await window.crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+            const hash = Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+            return await api.get(`/analysis/${hash}`);
+        } catch {
+            return null;
+        }
+    };
+
     const handleUpload = async () => {
         if (!file) return;
         setLoading(true);
@@ -146,7 +158,7 @@ export default function UploadSign() {
         formData.append('file', file);
 
         try {
-            const res = await api.post('/upload-document', formData);
+            const res = (await fetchStoredAnalysis(file)) ?? await api.post('/upload-document', formData);
             setDocHash(res.data.doc_hash);
             setSummary(res.data.summary);
             setSuggestedPlaces(res.data.suggested_places || []);
@@ -276,7 +288,10 @@ export default function UploadSign() {
             signature: sigData.signature,
             timestamp: sigData.timestamp,
             summary: summary,
-            user_image: user?.signature_image // Pass user image
+            // Reference the stored image; fall back to inline data for accounts that predate the image store
+            ...(user?.signature_image_id
+                ? { user_image_id: user.signature_image_id }
+                : { user_image: user?.signature_image })
         };
         formData.append('signature_data', JSON.stringify(signaturePayload));
 
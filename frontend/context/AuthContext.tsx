@@ -11,6 +11,7 @@ interface User {
     is_company: boolean;
     company_name?: string;
     signature_image?: string;
+    signature_image_id?: string;
 }
 
 interface AuthContextType {